@@ -5,14 +5,23 @@ Cloudinary image hosting, SendGrid emails, and Sentry monitoring
 """
 
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument, UpdateOne, ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson.objectid import ObjectId
+from bson import json_util
 from functools import wraps
 import os
 import urllib.parse
+import base64
+import csv
+import gzip
+import io
+import json
+import tempfile
 import pymongo
 import bcrypt
 import datetime
@@ -20,17 +29,37 @@ import re
 import jwt
 import logging
 import hashlib
+import html
 import secrets
+import socket
+import threading
+import bisect
+import heapq
+import time
 from dotenv import load_dotenv
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
-from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Email, To, Content
 from twilio.rest import Client as TwilioClient
+from twilio.http.http_client import TwilioHttpClient
+import requests
+from requests.adapters import HTTPAdapter
 import sentry_sdk
 from sentry_sdk.integrations.flask import FlaskIntegration
 
+# Brotli is optional - responses fall back to gzip without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# orjson is optional - JSON encoding falls back to the standard library without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 
@@ -73,17 +102,91 @@ TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
 TWILIO_WHATSAPP_FROM = os.environ.get('TWILIO_WHATSAPP_FROM', 'whatsapp:+14155238886')  # Twilio Sandbox number
 
+# Vendor HTTP settings: one keep-alive connection pool per vendor, shared by all senders in this process
+SENDGRID_SEND_URL = 'https://api.sendgrid.com/v3/mail/send'
+VENDOR_CONNECT_TIMEOUT = float(os.environ.get('VENDOR_CONNECT_TIMEOUT', 3.05))
+VENDOR_READ_TIMEOUT = float(os.environ.get('VENDOR_READ_TIMEOUT', 10))
+VENDOR_POOL_SIZE = int(os.environ.get('VENDOR_POOL_SIZE', 4))
+
+def create_vendor_session(session=None):
+    """requests.Session with a pooled keep-alive HTTPS adapter"""
+    session = session or requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=VENDOR_POOL_SIZE))
+    return session
+
+def elapsed_ms(started):
+    """Milliseconds since a time.perf_counter() reading"""
+    return round((time.perf_counter() - started) * 1000, 1)
+
+sendgrid_session = None
+if SENDGRID_API_KEY:
+    sendgrid_session = create_vendor_session()
+    sendgrid_session.headers.update({
+        "Authorization": f"Bearer {SENDGRID_API_KEY}",
+        "Content-Type": "application/json"
+    })
+
 # Initialize Twilio client
 twilio_client = None
 if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
     try:
-        twilio_client = TwilioClient(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        twilio_http_client = TwilioHttpClient(pool_connections=True)
+        create_vendor_session(twilio_http_client.session)
+        # Set after construction: TwilioHttpClient only validates scalar timeouts
+        twilio_http_client.timeout = (VENDOR_CONNECT_TIMEOUT, VENDOR_READ_TIMEOUT)
+        twilio_client = TwilioClient(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=twilio_http_client)
         logger.info("✅ Twilio WhatsApp client initialized successfully")
     except Exception as e:
         logger.error(f"❌ Failed to initialize Twilio client: {e}")
 
+# JSON encoding for MongoDB documents
+def _json_default(obj):
+    """Encode BSON/Python types that JSON has no native form for"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        # Stored datetimes are naive UTC; mark them as UTC so browsers do not read them as local time
+        if obj.tzinfo is not None:
+            obj = obj.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return obj.isoformat() + 'Z'
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode('ascii')
+    return DefaultJSONProvider.default(obj)
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes ObjectId (as str), datetime (as ISO 8601 UTC
+    with a "Z" suffix) and bytes (as base64) natively, so routes can return MongoDB
+    documents as-is. Uses orjson when it is installed.
+    """
+    ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z) if orjson else 0
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is not None:
+            return orjson.dumps(obj, default=_json_default, option=self.ORJSON_OPTIONS).decode('utf-8')
+        kwargs.setdefault('default', _json_default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+    
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_json_default, option=self.ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
 # Create Flask application
 app = Flask(__name__)
+app.json_provider_class = MongoJSONProvider
+app.json = MongoJSONProvider(app)
 
 # Configuration from environment variables
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'change-this-secret-key-in-production')
@@ -133,10 +236,17 @@ messages_collection = None
 categories_collection = None
 banners_collection = None
 popups_collection = None
+meta_collection = None
+import_jobs_collection = None
+notification_outbox_collection = None
+orders_archive_collection = None
+daily_sales_collection = None
+product_sales_collection = None
+rollup_outbox_collection = None
 
 def initialize_database():
     """Initialize database connection and collections"""
-    global client, db, users_collection, products_collection, orders_collection, offers_collection, carts_collection, reviews_collection, messages_collection, categories_collection, banners_collection, popups_collection
+    global client, db, users_collection, products_collection, orders_collection, offers_collection, carts_collection, reviews_collection, messages_collection, categories_collection, banners_collection, popups_collection, meta_collection, import_jobs_collection, notification_outbox_collection, orders_archive_collection, daily_sales_collection, product_sales_collection, rollup_outbox_collection
     
     try:
         # Optimized MongoDB connection for Render free tier
@@ -164,6 +274,13 @@ def initialize_database():
         categories_collection = db.categories
         banners_collection = db.banners
         popups_collection = db.popups
+        meta_collection = db.app_meta
+        import_jobs_collection = db.import_jobs
+        notification_outbox_collection = db.notification_outbox
+        orders_archive_collection = db.orders_archive
+        daily_sales_collection = db.daily_sales
+        product_sales_collection = db.product_sales
+        rollup_outbox_collection = db.rollup_outbox
         
         # Test connection
         client.admin.command('ping')
@@ -172,9 +289,28 @@ def initialize_database():
         # Create indexes for better performance
         users_collection.create_index([("email", ASCENDING)], unique=True, sparse=True)
         users_collection.create_index([("phone", ASCENDING)], unique=True, sparse=True)
-        orders_collection.create_index([("user_id", ASCENDING)])
-        orders_collection.create_index([("order_date", ASCENDING)])
+        # Customer stats: biggest spenders first, _id as the keyset tie-breaker
+        users_collection.create_index([("role", ASCENDING), ("total_spent", DESCENDING), ("_id", DESCENDING)])
+        # Order history: newest first per customer, _id breaks order_date ties for keyset pages
+        orders_collection.create_index([("user_id", ASCENDING), ("order_date", DESCENDING), ("_id", DESCENDING)])
+        # Admin order listing filters, all sorted newest first with _id as the keyset tie-breaker
+        orders_collection.create_index([("order_date", DESCENDING), ("_id", DESCENDING)])
+        orders_collection.create_index([("status", ASCENDING), ("order_date", DESCENDING), ("_id", DESCENDING)])
+        orders_collection.create_index([("customer_info.phone", ASCENDING), ("order_date", DESCENDING), ("_id", DESCENDING)])
+        orders_collection.create_index([("stock_reservation.status", ASCENDING), ("stock_reservation.expires_at", ASCENDING)], sparse=True)
+        # The archive serves order history and exports over the same keys
+        orders_archive_collection.create_index([("user_id", ASCENDING), ("order_date", DESCENDING), ("_id", DESCENDING)])
+        orders_archive_collection.create_index([("order_date", DESCENDING), ("_id", DESCENDING)])
         carts_collection.create_index([("user_id", ASCENDING)], unique=True)
+        # Product sales rollups are read by granularity and period range
+        product_sales_collection.create_index([("granularity", ASCENDING), ("period", ASCENDING)])
+        # Product listing filters (keyset pagination walks _id)
+        products_collection.create_index([("category", ASCENDING), ("_id", ASCENDING)])
+        products_collection.create_index([("price", ASCENDING)])
+        products_collection.create_index([("stock", ASCENDING)])
+        # Notification outbox: workers claim due messages by (status, next_attempt_at)
+        notification_outbox_collection.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)])
+        notification_outbox_collection.create_index([("order_id", ASCENDING)])
         logger.info("✅ Database indexes created/verified")
         
         # Initialize products if empty
@@ -234,6 +370,279 @@ def sanitize_string(text):
     # Remove potentially dangerous characters
     return re.sub(r'[<>"\']', '', str(text))
 
+def parse_product_id(product_id):
+    """Product _ids are ints for the seeded catalog and ObjectIds otherwise (raises ValueError)"""
+    if isinstance(product_id, (int, ObjectId)) and not isinstance(product_id, bool):
+        return product_id
+    product_id = str(product_id).strip()
+    if product_id.isdigit():
+        return int(product_id)
+    if ObjectId.is_valid(product_id):
+        return ObjectId(product_id)
+    raise ValueError(f"Invalid product id: {product_id}")
+
+# ========== CONTENT VERSIONING & IN-PROCESS CACHE ==========
+# Every cacheable content area (e.g. "catalog") has a version counter stored in a
+# single app_meta document, so all gunicorn workers notice admin changes. Each
+# worker keeps its own pre-serialized snapshot and only re-reads the shared
+# counters every CONTENT_VERSION_CHECK_SECONDS.
+CONTENT_VERSIONS_DOC_ID = "content_versions"
+CONTENT_VERSION_CHECK_SECONDS = float(os.environ.get('CONTENT_VERSION_CHECK_SECONDS', 5))
+PUBLIC_CACHE_MAX_AGE = int(os.environ.get('PUBLIC_CACHE_MAX_AGE', 30))  # Browser cache lifetime for storefront data
+
+_content_versions = {}
+_content_versions_checked_at = float('-inf')
+_content_versions_lock = threading.Lock()
+_content_cache = {}
+_content_build_locks = {}
+_ttl_cache = {}
+
+def _store_content_versions(doc):
+    """Replace the local view of the shared content versions"""
+    global _content_versions, _content_versions_checked_at
+    with _content_versions_lock:
+        _content_versions = {k: v for k, v in (doc or {}).items() if k != '_id'}
+        _content_versions_checked_at = time.monotonic()
+
+def bump_content_version(name):
+    """Mark a content area as changed so cached snapshots are rebuilt"""
+    try:
+        doc = meta_collection.find_one_and_update(
+            {"_id": CONTENT_VERSIONS_DOC_ID},
+            {"$inc": {name: 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        _store_content_versions(doc)
+        return doc[name]
+    except Exception as e:
+        # Fall back to a local bump - this worker still rebuilds immediately
+        logger.error(f"❌ Error bumping content version '{name}': {e}")
+        with _content_versions_lock:
+            _content_versions[name] = _content_versions.get(name, 0) + 1
+            return _content_versions[name]
+
+def get_content_version(name):
+    """Get the current version of a content area (re-checked every few seconds)"""
+    global _content_versions_checked_at
+    if time.monotonic() - _content_versions_checked_at >= CONTENT_VERSION_CHECK_SECONDS:
+        try:
+            _store_content_versions(meta_collection.find_one({"_id": CONTENT_VERSIONS_DOC_ID}))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not refresh content versions: {e}")
+            with _content_versions_lock:
+                _content_versions_checked_at = time.monotonic()
+    return _content_versions.get(name, 0)
+
+def get_cached_content(name, builder, depends_on=None):
+    """
+    Return the cached snapshot for a content area, rebuilding it with builder()
+    only when the version of the content it depends on has changed.
+    The snapshot holds the payload, its serialized JSON body and a strong ETag.
+    """
+    version = tuple(get_content_version(dep) for dep in (depends_on or (name,)))
+    entry = _content_cache.get(name)
+    if entry is not None and entry['version'] == version:
+        return entry
+
+    with _content_build_locks.setdefault(name, threading.Lock()):
+        # Another request may have rebuilt the snapshot while we waited
+        entry = _content_cache.get(name)
+        if entry is not None and entry['version'] == version:
+            return entry
+
+        payload = builder()
+        body = f"{app.json.dumps(payload)}\n".encode('utf-8')
+        version_tag = '.'.join(str(v) for v in version)
+        entry = {
+            "version": version,
+            "payload": payload,
+            "body": body,
+            "etag": f"{name}-{version_tag}-{hashlib.sha1(body).hexdigest()[:16]}",
+            "encoded": {}  # Content-Encoding -> compressed body, filled on first use
+        }
+        _content_cache[name] = entry
+        logger.info(f"🔄 Rebuilt '{name}' snapshot (version {version_tag})")
+        return entry
+
+def get_ttl_cached(name, builder, ttl):
+    """
+    Return builder()'s result, recomputed at most once every ttl seconds per worker.
+    Concurrent callers wait for a single rebuild instead of all hitting the database.
+    """
+    entry = _ttl_cache.get(name)
+    if entry is not None and entry['expires_at'] > time.monotonic():
+        return entry['payload']
+    
+    with _content_build_locks.setdefault(f"ttl:{name}", threading.Lock()):
+        entry = _ttl_cache.get(name)
+        if entry is not None and entry['expires_at'] > time.monotonic():
+            return entry['payload']
+        payload = builder()
+        _ttl_cache[name] = {"payload": payload, "expires_at": time.monotonic() + ttl}
+        return payload
+
+def cached_content_response(entry, max_age=None):
+    """
+    Build a JSON response from a cached snapshot without re-serializing it.
+    Large bodies are compressed once per version and reused for every request.
+    Answers 304 Not Modified when the client already holds the current ETag.
+    """
+    body = entry['body']
+    encoding = choose_content_encoding() if len(body) >= COMPRESSION_MIN_BYTES else None
+    etag = f"{entry['etag']}-{encoding}" if encoding else entry['etag']
+    
+    # Any representation of the current version is still valid for the client
+    known_etags = [entry['etag']] + [f"{entry['etag']}-{enc}" for enc in COMPRESSION_ENCODINGS]
+    if any(tag in request.if_none_match for tag in known_etags):
+        response = app.response_class(status=304)
+    else:
+        if encoding:
+            encoded = entry['encoded'].get(encoding)
+            if encoded is None:
+                encoded = entry['encoded'][encoding] = compress_body(body, encoding)
+            body = encoded
+        response = app.response_class(body, mimetype=app.json.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    
+    if len(entry['body']) >= COMPRESSION_MIN_BYTES:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={PUBLIC_CACHE_MAX_AGE if max_age is None else max_age}"
+    return response
+
+# ========== RESPONSE COMPRESSION ==========
+# JSON/text responses above COMPRESSION_MIN_BYTES are compressed with Brotli or
+# gzip, whichever the client accepts, at moderate levels. Cached snapshots are
+# compressed once per version, but on the request thread of the first request
+# after a catalog write, so they use the same levels as per-request bodies.
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def choose_content_encoding():
+    """Pick the best compression the client accepts, or None"""
+    for encoding in COMPRESSION_ENCODINGS:
+        if request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+def compress_body(body, encoding):
+    """Compress bytes with the given Content-Encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+@app.after_request
+def compress_response(response):
+    """Compress large JSON/text responses that were not compressed already"""
+    if (response.status_code < 200 or response.status_code >= 300
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = choose_content_encoding()
+    if encoding:
+        response.set_data(compress_body(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+# ========== PAGINATION HELPERS ==========
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+def encode_cursor(values):
+    """Encode keyset values (ObjectId, datetime, numbers) into an opaque URL-safe cursor"""
+    raw = json_util.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor (raises ValueError if malformed)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+def decode_cursor_pair(cursor):
+    """Decode a two-value (sort key, _id) cursor (raises ValueError if malformed)"""
+    values = decode_cursor(cursor)
+    if not isinstance(values, list) or len(values) != 2 or not isinstance(values[1], ObjectId):
+        raise ValueError("Invalid cursor.")
+    return values
+
+def parse_page_limit(args, default=DEFAULT_PAGE_LIMIT, maximum=MAX_PAGE_LIMIT):
+    """Read the ?limit= query parameter, clamped to [1, maximum]"""
+    try:
+        limit = int(args.get('limit', default))
+    except (TypeError, ValueError):
+        raise ValueError("limit must be a number.")
+    return max(1, min(limit, maximum))
+
+# ========== STREAMING JSON RESPONSES ==========
+STREAM_BATCH_SIZE = 500
+
+def wants_raw_stream(args):
+    """True when the client opted into the streamed ?raw=1 list format"""
+    return args.get('raw', '').lower() in ('1', 'true', 'yes')
+
+def batched_find(collection, *args, **kwargs):
+    """find() fetching STREAM_BATCH_SIZE documents per round trip, for streaming"""
+    return collection.find(*args, **kwargs).batch_size(STREAM_BATCH_SIZE)
+
+def iter_json_array(cursor, key):
+    """
+    Yield {"success": true, "<key>": [...], "count": n, "complete": bool} chunk by chunk from a cursor.
+    Each document is encoded as soon as it arrives, so only the cursor's current
+    batch is held in memory.
+    """
+    yield f'{{"success":true,"{key}":['.encode('utf-8')
+    count = 0
+    complete = True
+    try:
+        for document in cursor:
+            encoded = app.json.dumps(document).encode('utf-8')
+            yield encoded if count == 0 else b',' + encoded
+            count += 1
+    except Exception as e:
+        # Headers are already sent; close the array so the body stays valid JSON
+        logger.error(f"❌ Error streaming {key}: {e}")
+        complete = False
+    finally:
+        cursor.close()
+    yield f'],"count":{count},"complete":{"true" if complete else "false"}}}\n'.encode('utf-8')
+
+def stream_json_array(cursor, key):
+    """Wrap iter_json_array in a streamed JSON response"""
+    return app.response_class(iter_json_array(cursor, key), mimetype=app.json.mimetype)
+
+def iter_ndjson(cursor):
+    """Yield one JSON document per line from a cursor"""
+    try:
+        for document in cursor:
+            yield app.json.dumps(document).encode('utf-8') + b'\n'
+    except Exception as e:
+        # Headers are already sent; a truncated NDJSON body is still line-parseable
+        logger.error(f"❌ Error streaming NDJSON: {e}")
+    finally:
+        cursor.close()
+
+def stream_ndjson(cursor, filename=None):
+    """Wrap iter_ndjson in a streamed application/x-ndjson response"""
+    response = app.response_class(iter_ndjson(cursor), mimetype='application/x-ndjson')
+    if filename:
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 # Cloudinary helper functions
 def upload_image_to_cloudinary(image_data, folder="products"):
     """Upload image to Cloudinary and return URL"""
@@ -292,11 +701,25 @@ def send_email(to_email, subject, html_content, plain_content=None):
         if plain_content:
             message.plain_text_content = Content("text/plain", plain_content)
         
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        
-        logger.info(f"✅ Email sent to {to_email}: {subject}")
-        return {"success": True, "status_code": response.status_code}
+        started = time.perf_counter()
+        try:
+            response = sendgrid_session.post(
+                SENDGRID_SEND_URL,
+                json=message.get(),
+                timeout=(VENDOR_CONNECT_TIMEOUT, VENDOR_READ_TIMEOUT)
+            )
+        except requests.RequestException as e:
+            vendor_ms = elapsed_ms(started)
+            logger.error(f"❌ SendGrid email error ({vendor_ms} ms): {e}")
+            return {"success": False, "message": str(e), "vendor_ms": vendor_ms}
+        vendor_ms = elapsed_ms(started)
+        
+        if response.status_code >= 400:
+            logger.error(f"❌ SendGrid email error ({vendor_ms} ms): HTTP {response.status_code} {response.text[:200]}")
+            return {"success": False, "message": f"SendGrid HTTP {response.status_code}", "status_code": response.status_code, "vendor_ms": vendor_ms}
+        
+        logger.info(f"✅ Email sent to {to_email} in {vendor_ms} ms: {subject}")
+        return {"success": True, "status_code": response.status_code, "vendor_ms": vendor_ms}
     except Exception as e:
         logger.error(f"❌ SendGrid email error: {e}")
         return {"success": False, "message": str(e)}
@@ -313,14 +736,21 @@ def send_whatsapp_message(to_phone, message_body):
         if not to_phone.startswith('whatsapp:'):
             to_phone = f"whatsapp:{to_phone}"
         
-        message = twilio_client.messages.create(
-            from_=TWILIO_WHATSAPP_FROM,
-            body=message_body,
-            to=to_phone
-        )
+        started = time.perf_counter()
+        try:
+            message = twilio_client.messages.create(
+                from_=TWILIO_WHATSAPP_FROM,
+                body=message_body,
+                to=to_phone
+            )
+        except Exception as e:
+            vendor_ms = elapsed_ms(started)
+            logger.error(f"❌ Twilio WhatsApp error ({vendor_ms} ms): {e}")
+            return {"success": False, "message": str(e), "vendor_ms": vendor_ms}
+        vendor_ms = elapsed_ms(started)
         
-        logger.info(f"✅ WhatsApp message sent to {to_phone}")
-        return {"success": True, "message_sid": message.sid}
+        logger.info(f"✅ WhatsApp message sent to {to_phone} in {vendor_ms} ms")
+        return {"success": True, "message_sid": message.sid, "vendor_ms": vendor_ms}
     except Exception as e:
         logger.error(f"❌ Twilio WhatsApp error: {e}")
         return {"success": False, "message": str(e)}
@@ -386,47 +816,91 @@ Railway Road, Barara, Ambala
     
     return send_whatsapp_message(customer_phone, message)
 
-def send_order_confirmation_email(order_data, customer_email):
-    """Send order confirmation email"""
-    subject = f"Order Confirmation - #{order_data['order_id']}"
-    
-    # Build items HTML
-    items_html = ""
-    for item in order_data['items']:
-        items_html += f"""
-        <tr>
-            <td style="padding: 10px; border-bottom: 1px solid #eee;">{item['name']}</td>
-            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: center;">{item['quantity']}</td>
-            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: right;">₹{item['price']}</td>
-            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: right;">₹{item['price'] * item['quantity']}</td>
-        </tr>
-        """
-    
-    html_content = f"""
+# ========== EMAIL TEMPLATES ==========
+# Templates are compiled once at import into alternating literal/slot parts, so a
+# render is a single join over the per-order values. Shared header and footer
+# markup is folded into the literals at compile time. Slot values are HTML-escaped
+# unless the slot name ends in "_html" (fragments the renderer built itself).
+# render_email_batch renders one template for many orders, which bulk status
+# updates use to render all of their emails when they are queued.
+EMAIL_SLOT_PATTERN = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+EMAIL_LOGO_URL = "https://i.ibb.co/N6Q46Xdk/Vintage-Men-s-Portrait-in-Brown-Tones.png"
+
+def compile_email_template(source, escape=True):
+    """Split a {{slot}} template into (parts, escape); odd-indexed parts are slot names"""
+    return (tuple(EMAIL_SLOT_PATTERN.split(source)), escape)
+
+def render_email_template(template, values):
+    """Render a compiled template with a dict of slot values"""
+    parts, escape = template
+    out = list(parts)
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        value = str(values.get(name, ''))
+        out[i] = value if (not escape or name.endswith('_html')) else html.escape(value)
+    return ''.join(out)
+
+def render_email_batch(template, values_list):
+    """Render one compiled template for many value dicts"""
+    return [render_email_template(template, values) for values in values_list]
+
+def _email_header_html(title, logo_size, tagline, location, body_font="'Poppins', Arial, sans-serif", body_color="#2D2D2D"):
+    """Document head and branded header block (compile-time fragment)"""
+    return f"""
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
     </head>
-    <body style="font-family: 'Poppins', Arial, sans-serif; line-height: 1.6; color: #2D2D2D; max-width: 600px; margin: 0 auto; padding: 20px;">
+    <body style="font-family: {body_font}; line-height: 1.6; color: {body_color}; max-width: 600px; margin: 0 auto; padding: 20px;">
         <!-- Header with Logo and Branding -->
         <div style="background: linear-gradient(135deg, #9C6F44 0%, #B88B4A 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
-            <img src="https://i.ibb.co/N6Q46Xdk/Vintage-Men-s-Portrait-in-Brown-Tones.png" alt="Arun Karyana Store" style="width: 70px; height: 70px; border-radius: 50%; border: 3px solid white; margin-bottom: 15px;">
-            <h1 style="margin: 0; font-size: 28px; font-family: 'Playfair Display', serif;">Thank You for Your Order! 🎉</h1>
-            <p style="margin: 10px 0 0; font-size: 16px;">Arun Karyana Store</p>
-            <p style="margin: 5px 0 0; font-size: 12px; opacity: 0.9;">Railway Road, Barara, Ambala, Haryana</p>
+            <img src="{EMAIL_LOGO_URL}" alt="Arun Karyana Store" style="width: {logo_size}; height: {logo_size}; border-radius: 50%; border: 3px solid white; margin-bottom: 15px;">
+            <h1 style="margin: 0; font-size: 28px; font-family: 'Playfair Display', serif;">{title}</h1>
+            <p style="margin: 10px 0 0; font-size: 16px;{tagline}">Arun Karyana Store</p>
+            <p style="margin: 5px 0 0; font-size: 12px; opacity: 0.9;">{location}</p>
         </div>
-        
+        """
+
+# Contact details and signature shared by the order emails
+ORDER_EMAIL_FOOTER_HTML = f"""
+            <p style="margin-top: 30px;">If you have any questions, please contact us:</p>
+            <p style="margin: 5px 0;">📞 Phone: +91-XXXXXXXXXX</p>
+            <p style="margin: 5px 0;">📍 Railway Road, Barara, Ambala, Haryana 133201</p>
+            
+            <div style="text-align: center; margin-top: 30px; padding-top: 20px; border-top: 2px solid #E8C07D;">
+                <img src="{EMAIL_LOGO_URL}" alt="Arun Karyana Store" style="width: 50px; height: 50px; border-radius: 50%; margin: 0 auto 15px; display: block;">
+                <p style="color: #9C6F44; font-size: 14px; font-weight: 600;">Thank you for shopping with Arun Karyana Store!</p>
+                <p style="color: #2D2D2D; font-size: 12px; margin-top: 10px;">Serving Barara since 1977</p>
+                <p style="color: #6b7280; font-size: 11px; margin-top: 10px;">Railway Road, Barara, Ambala, Haryana 133201</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+ORDER_ITEM_ROW_TEMPLATE = compile_email_template("""
+        <tr>
+            <td style="padding: 10px; border-bottom: 1px solid #eee;">{{name}}</td>
+            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: center;">{{quantity}}</td>
+            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: right;">₹{{price}}</td>
+            <td style="padding: 10px; border-bottom: 1px solid #eee; text-align: right;">₹{{line_total}}</td>
+        </tr>
+        """)
+
+ORDER_CONFIRMATION_EMAIL_TEMPLATE = compile_email_template(_email_header_html(
+    "Thank You for Your Order! 🎉", "70px", "", "Railway Road, Barara, Ambala, Haryana"
+) + """
         <div style="background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px;">
-            <p style="font-size: 16px;">Dear {order_data['customer_name']},</p>
+            <p style="font-size: 16px;">Dear {{customer_name}},</p>
             
             <p>Your order has been successfully placed and will be processed shortly.</p>
             
             <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #9C6F44;">
                 <h2 style="color: #9C6F44; margin-top: 0; font-family: 'Playfair Display', serif;">Order Details</h2>
-                <p><strong>Order ID:</strong> #{order_data['order_id']}</p>
-                <p><strong>Order Date:</strong> {order_data['order_date']}</p>
+                <p><strong>Order ID:</strong> #{{order_id}}</p>
+                <p><strong>Order Date:</strong> {{order_date}}</p>
                 <p><strong>Status:</strong> <span style="color: #f59e0b;">Pending</span></p>
             </div>
             
@@ -442,20 +916,20 @@ def send_order_confirmation_email(order_data, customer_email):
                         </tr>
                     </thead>
                     <tbody>
-                        {items_html}
+                        {{items_html}}
                     </tbody>
                     <tfoot>
                         <tr>
                             <td colspan="3" style="padding: 10px; text-align: right; font-weight: bold;">Subtotal:</td>
-                            <td style="padding: 10px; text-align: right; font-weight: bold;">₹{order_data['subtotal']}</td>
+                            <td style="padding: 10px; text-align: right; font-weight: bold;">₹{{subtotal}}</td>
                         </tr>
                         <tr>
                             <td colspan="3" style="padding: 10px; text-align: right;">Delivery Fee:</td>
-                            <td style="padding: 10px; text-align: right;">₹{order_data['delivery_fee']}</td>
+                            <td style="padding: 10px; text-align: right;">₹{{delivery_fee}}</td>
                         </tr>
                         <tr style="background: #F8F5F0;">
                             <td colspan="3" style="padding: 10px; text-align: right; font-weight: bold; font-size: 18px;">Total Amount:</td>
-                            <td style="padding: 10px; text-align: right; font-weight: bold; font-size: 18px; color: #9C6F44;">₹{order_data['total_amount']}</td>
+                            <td style="padding: 10px; text-align: right; font-weight: bold; font-size: 18px; color: #9C6F44;">₹{{total_amount}}</td>
                         </tr>
                     </tfoot>
                 </table>
@@ -463,122 +937,53 @@ def send_order_confirmation_email(order_data, customer_email):
             
             <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0;">
                 <h3 style="color: #9C6F44; margin-top: 0; font-family: 'Playfair Display', serif;">Delivery Address</h3>
-                <p style="margin: 5px 0;"><strong>{order_data['customer_name']}</strong></p>
-                <p style="margin: 5px 0;">{order_data['customer_phone']}</p>
-                <p style="margin: 5px 0;">{order_data['customer_address']}</p>
+                <p style="margin: 5px 0;"><strong>{{customer_name}}</strong></p>
+                <p style="margin: 5px 0;">{{customer_phone}}</p>
+                <p style="margin: 5px 0;">{{customer_address}}</p>
             </div>
             
             <div style="background: #F8F5F0; border-left: 4px solid #9C6F44; padding: 15px; margin: 20px 0; border-radius: 4px;">
                 <p style="margin: 0; color: #9C6F44;"><strong>📦 What's Next?</strong></p>
                 <p style="margin: 10px 0 0; color: #2D2D2D;">Our team will process your order and contact you shortly for delivery confirmation.</p>
             </div>
-            
-            <p style="margin-top: 30px;">If you have any questions, please contact us:</p>
-            <p style="margin: 5px 0;">📞 Phone: +91-XXXXXXXXXX</p>
-            <p style="margin: 5px 0;">📍 Railway Road, Barara, Ambala, Haryana 133201</p>
-            
-            <div style="text-align: center; margin-top: 30px; padding-top: 20px; border-top: 2px solid #E8C07D;">
-                <img src="https://i.ibb.co/N6Q46Xdk/Vintage-Men-s-Portrait-in-Brown-Tones.png" alt="Arun Karyana Store" style="width: 50px; height: 50px; border-radius: 50%; margin: 0 auto 15px; display: block;">
-                <p style="color: #9C6F44; font-size: 14px; font-weight: 600;">Thank you for shopping with Arun Karyana Store!</p>
-                <p style="color: #2D2D2D; font-size: 12px; margin-top: 10px;">Serving Barara since 1977</p>
-                <p style="color: #6b7280; font-size: 11px; margin-top: 10px;">Railway Road, Barara, Ambala, Haryana 133201</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return send_email(customer_email, subject, html_content)
+            """ + ORDER_EMAIL_FOOTER_HTML)
 
-def send_order_status_update_email(order_data, customer_email, new_status, cancellation_reason=None):
-    """Send order status update email"""
-    status_messages = {
-        "Processing": "Your order is now being prepared! 📦",
-        "Out for Delivery": "Your order is on its way! 🚚",
-        "Delivered": "Your order has been delivered! ✅",
-        "Cancelled": "Your order has been cancelled. 🚫"
-    }
-    
-    subject = f"Order Status Update - #{order_data['order_id']}"
-    status_message = status_messages.get(new_status, f"Order status updated to: {new_status}")
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    </head>
-    <body style="font-family: 'Poppins', Arial, sans-serif; line-height: 1.6; color: #2D2D2D; max-width: 600px; margin: 0 auto; padding: 20px;">
-        <!-- Header with Logo and Branding -->
-        <div style="background: linear-gradient(135deg, #9C6F44 0%, #B88B4A 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
-            <img src="https://i.ibb.co/N6Q46Xdk/Vintage-Men-s-Portrait-in-Brown-Tones.png" alt="Arun Karyana Store" style="width: 60px; height: 60px; border-radius: 50%; border: 3px solid white; margin-bottom: 15px;">
-            <h1 style="margin: 0; font-size: 28px; font-family: 'Playfair Display', serif;">Order Status Updated</h1>
-            <p style="margin: 10px 0 0; font-size: 16px;">Arun Karyana Store</p>
-            <p style="margin: 5px 0 0; font-size: 12px; opacity: 0.9;">Railway Road, Barara, Ambala</p>
-        </div>
-        
+CANCELLATION_REASON_TEMPLATE = compile_email_template(
+    """<div style="background: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #ffc107;"><h3 style="color: #856404; margin-top: 0; font-family: 'Playfair Display', serif;"><i class="fas fa-info-circle"></i> Cancellation Reason</h3><p style="color: #856404; margin: 0;">{{cancellation_reason}}</p></div>"""
+)
+
+ORDER_STATUS_EMAIL_TEMPLATE = compile_email_template(_email_header_html(
+    "Order Status Updated", "60px", "", "Railway Road, Barara, Ambala"
+) + """
         <div style="background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px;">
-            <p style="font-size: 16px;">Dear {order_data['customer_name']},</p>
+            <p style="font-size: 16px;">Dear {{customer_name}},</p>
             
             <div style="background: white; padding: 25px; border-radius: 8px; margin: 20px 0; text-align: center; border-left: 4px solid #9C6F44;">
-                <p style="font-size: 24px; margin: 0; color: #9C6F44; font-weight: bold; font-family: 'Playfair Display', serif;">{status_message}</p>
+                <p style="font-size: 24px; margin: 0; color: #9C6F44; font-weight: bold; font-family: 'Playfair Display', serif;">{{status_message}}</p>
             </div>
             
             <div style="background: white; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #9C6F44;">
                 <h2 style="color: #9C6F44; margin-top: 0; font-family: 'Playfair Display', serif;">Order Details</h2>
-                <p><strong>Order ID:</strong> #{order_data['order_id']}</p>
-                <p><strong>Total Amount:</strong> <span style="color: #9C6F44; font-weight: bold;">₹{order_data['total_amount']}</span></p>
-                <p><strong>Current Status:</strong> <span style="color: #9C6F44; font-weight: bold;">{new_status}</span></p>
+                <p><strong>Order ID:</strong> #{{order_id}}</p>
+                <p><strong>Total Amount:</strong> <span style="color: #9C6F44; font-weight: bold;">₹{{total_amount}}</span></p>
+                <p><strong>Current Status:</strong> <span style="color: #9C6F44; font-weight: bold;">{{new_status}}</span></p>
             </div>
             
-            {'<div style="background: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #ffc107;"><h3 style="color: #856404; margin-top: 0; font-family: \'Playfair Display\', serif;"><i class="fas fa-info-circle"></i> Cancellation Reason</h3><p style="color: #856404; margin: 0;">' + str(cancellation_reason) + '</p></div>' if cancellation_reason else ''}
-            
-            <p style="margin-top: 30px;">If you have any questions, please contact us:</p>
-            <p style="margin: 5px 0;">📞 Phone: +91-XXXXXXXXXX</p>
-            <p style="margin: 5px 0;">📍 Railway Road, Barara, Ambala, Haryana 133201</p>
-            
-            <div style="text-align: center; margin-top: 30px; padding-top: 20px; border-top: 2px solid #E8C07D;">
-                <img src="https://i.ibb.co/N6Q46Xdk/Vintage-Men-s-Portrait-in-Brown-Tones.png" alt="Arun Karyana Store" style="width: 50px; height: 50px; border-radius: 50%; margin: 0 auto 15px; display: block;">
-                <p style="color: #9C6F44; font-size: 14px; font-weight: 600;">Thank you for shopping with Arun Karyana Store!</p>
-                <p style="color: #2D2D2D; font-size: 12px; margin-top: 10px;">Serving Barara since 1977</p>
-                <p style="color: #6b7280; font-size: 11px; margin-top: 10px;">Railway Road, Barara, Ambala, Haryana 133201</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return send_email(customer_email, subject, html_content)
+            {{cancellation_html}}
+            """ + ORDER_EMAIL_FOOTER_HTML)
 
-def send_password_reset_email(user, reset_url):
-    """Send password reset email with secure token link"""
-    subject = "Reset Your Password - Arun Karyana Store"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    </head>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; padding: 20px;">
-        <!-- Header with Logo and Branding -->
-        <div style="background: linear-gradient(135deg, #9C6F44 0%, #B88B4A 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0;">
-            <img src="https://i.ibb.co/N6Q46Xdk/Vintage-Men-s-Portrait-in-Brown-Tones.png" alt="Arun Karyana Store" style="width: 60px; height: 60px; border-radius: 50%; border: 3px solid white; margin-bottom: 15px;">
-            <h1 style="margin: 0; font-size: 28px; font-family: 'Playfair Display', serif;">🔒 Password Reset</h1>
-            <p style="margin: 10px 0 0; font-size: 16px; font-family: 'Poppins', sans-serif;">Arun Karyana Store</p>
-            <p style="margin: 5px 0 0; font-size: 12px; opacity: 0.9;">Railway Road, Barara, Ambala</p>
-        </div>
-        
+PASSWORD_RESET_EMAIL_TEMPLATE = compile_email_template(_email_header_html(
+    "🔒 Password Reset", "60px", " font-family: 'Poppins', sans-serif;", "Railway Road, Barara, Ambala",
+    body_font="Arial, sans-serif", body_color="#333"
+) + """
         <div style="background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px;">
-            <p style="font-size: 16px;">Dear {user.get('name', 'Customer')},</p>
+            <p style="font-size: 16px;">Dear {{name}},</p>
             
             <p>We received a request to reset your password for your Arun Karyana Store account.</p>
             
             <div style="background: white; padding: 25px; border-radius: 8px; margin: 20px 0; text-align: center;">
                 <p style="margin-bottom: 20px; color: #6b7280;">Click the button below to reset your password:</p>
-                <a href="{reset_url}" style="display: inline-block; background: linear-gradient(135deg, #9C6F44 0%, #B88B4A 100%); color: white; padding: 15px 40px; text-decoration: none; border-radius: 8px; font-weight: bold; font-size: 16px; box-shadow: 0 4px 6px rgba(156, 111, 68, 0.3);">Reset Password</a>
+                <a href="{{reset_url}}" style="display: inline-block; background: linear-gradient(135deg, #9C6F44 0%, #B88B4A 100%); color: white; padding: 15px 40px; text-decoration: none; border-radius: 8px; font-weight: bold; font-size: 16px; box-shadow: 0 4px 6px rgba(156, 111, 68, 0.3);">Reset Password</a>
             </div>
             
             <div style="background: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 20px 0; border-radius: 4px;">
@@ -589,7 +994,7 @@ def send_password_reset_email(user, reset_url):
             
             <p style="font-size: 14px; color: #6b7280; margin-top: 25px;">
                 If the button doesn't work, copy and paste this link into your browser:<br>
-                <a href="{reset_url}" style="color: #9C6F44; word-break: break-all;">{reset_url}</a>
+                <a href="{{reset_url}}" style="color: #9C6F44; word-break: break-all;">{{reset_url}}</a>
             </p>
             
             <div style="text-align: center; margin-top: 30px; padding-top: 20px; border-top: 2px solid #e5e7eb;">
@@ -600,16 +1005,16 @@ def send_password_reset_email(user, reset_url):
         </div>
     </body>
     </html>
-    """
-    
-    plain_content = f"""
+    """)
+
+PASSWORD_RESET_PLAIN_TEMPLATE = compile_email_template("""
     Password Reset Request - Arun Karyana Store
     
-    Dear {user.get('name', 'Customer')},
+    Dear {{name}},
     
     We received a request to reset your password. Click the link below to reset your password:
     
-    {reset_url}
+    {{reset_url}}
     
     This link will expire in 1 hour.
     
@@ -617,10 +1022,246 @@ def send_password_reset_email(user, reset_url):
     
     Thank you,
     Arun Karyana Store Team
-    """
-    
+    """, escape=False)
+
+ORDER_STATUS_MESSAGES = {
+    "Processing": "Your order is now being prepared! 📦",
+    "Out for Delivery": "Your order is on its way! 🚚",
+    "Delivered": "Your order has been delivered! ✅",
+    "Cancelled": "Your order has been cancelled. 🚫"
+}
+
+def render_order_confirmation_email(order_data):
+    """Return (subject, html) for an order confirmation"""
+    items_html = ''.join(render_email_batch(ORDER_ITEM_ROW_TEMPLATE, [
+        {
+            "name": item['name'],
+            "quantity": item['quantity'],
+            "price": item['price'],
+            "line_total": item['price'] * item['quantity']
+        }
+        for item in order_data['items']
+    ]))
+    values = dict(order_data, items_html=items_html)
+    return f"Order Confirmation - #{order_data['order_id']}", render_email_template(ORDER_CONFIRMATION_EMAIL_TEMPLATE, values)
+
+def render_order_status_email(order_data, new_status, cancellation_reason=None):
+    """Return (subject, html) for an order status update"""
+    return render_order_status_emails([order_data], new_status, cancellation_reason)[0]
+
+def render_order_status_emails(orders, new_status, cancellation_reason=None):
+    """Batch-render status update emails for many orders: a list of (subject, html)"""
+    # The status message and cancellation block are shared, so they are rendered once
+    cancellation_html = render_email_template(CANCELLATION_REASON_TEMPLATE, {"cancellation_reason": cancellation_reason}) if cancellation_reason else ''
+    status_message = ORDER_STATUS_MESSAGES.get(new_status, f"Order status updated to: {new_status}")
+    bodies = render_email_batch(ORDER_STATUS_EMAIL_TEMPLATE, [
+        dict(order_data, new_status=new_status, status_message=status_message, cancellation_html=cancellation_html)
+        for order_data in orders
+    ])
+    return [(f"Order Status Update - #{order_data['order_id']}", body) for order_data, body in zip(orders, bodies)]
+
+def send_order_confirmation_email(order_data, customer_email):
+    """Send order confirmation email"""
+    subject, html_content = render_order_confirmation_email(order_data)
+    return send_email(customer_email, subject, html_content)
+
+def send_order_status_update_email(order_data, customer_email, new_status, cancellation_reason=None):
+    """Send order status update email"""
+    subject, html_content = render_order_status_email(order_data, new_status, cancellation_reason)
+    return send_email(customer_email, subject, html_content)
+
+def send_password_reset_email(user, reset_url):
+    """Send password reset email with secure token link"""
+    subject = "Reset Your Password - Arun Karyana Store"
+    values = {"name": user.get('name', 'Customer'), "reset_url": reset_url}
+    html_content = render_email_template(PASSWORD_RESET_EMAIL_TEMPLATE, values)
+    plain_content = render_email_template(PASSWORD_RESET_PLAIN_TEMPLATE, values)
     return send_email(user['email'], subject, html_content, plain_content)
 
+# ========== NOTIFICATION OUTBOX ==========
+# Order notifications are written to notification_outbox in the same transaction
+# as the order change and delivered by background workers, so checkout and
+# status updates never wait on SendGrid or Twilio.
+NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', 2))
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 6))
+NOTIFICATION_RETRY_BASE_SECONDS = 30
+NOTIFICATION_RETRY_MAX_SECONDS = 3600
+NOTIFICATION_LEASE_SECONDS = 120  # A 'sending' message is reclaimed after this if its worker died
+NOTIFICATION_POLL_SECONDS = 10
+NOTIFICATION_STATUSES = ('pending', 'retrying', 'sending', 'sent', 'failed', 'skipped')
+
+_notification_workers_pid = None
+_notification_workers_lock = threading.Lock()
+_notification_wakeup = threading.Event()
+
+def _send_order_confirmation_email_message(payload, to):
+    return send_order_confirmation_email(payload['order_data'], to)
+
+def _send_order_confirmation_whatsapp_message(payload, to):
+    return send_order_confirmation_whatsapp(payload['order_data'], to)
+
+def _send_order_status_email_message(payload, to):
+    # Bulk status updates render their emails in one batch when they are queued
+    if payload.get('html'):
+        return send_email(to, payload['subject'], payload['html'])
+    return send_order_status_update_email(payload['order_data'], to, payload['new_status'], payload.get('cancellation_reason'))
+
+def _send_order_status_whatsapp_message(payload, to):
+    return send_order_status_update_whatsapp(payload['order_data'], to, payload['new_status'], payload.get('cancellation_reason'))
+
+# kind -> (channel, sender)
+NOTIFICATION_HANDLERS = {
+    'order_confirmation_email': ('email', _send_order_confirmation_email_message),
+    'order_confirmation_whatsapp': ('whatsapp', _send_order_confirmation_whatsapp_message),
+    'order_status_email': ('email', _send_order_status_email_message),
+    'order_status_whatsapp': ('whatsapp', _send_order_status_whatsapp_message),
+}
+
+def notification_channel_configured(channel):
+    """True when the vendor behind a notification channel has credentials"""
+    if channel == 'email':
+        return bool(SENDGRID_API_KEY)
+    if channel == 'whatsapp':
+        return twilio_client is not None
+    return False
+
+def build_notification(kind, to, payload, order_id=None):
+    """Build an outbox document; insert it with enqueue_notifications"""
+    now = datetime.datetime.utcnow()
+    return {
+        "kind": kind,
+        "channel": NOTIFICATION_HANDLERS[kind][0],
+        "to": to,
+        "payload": payload,
+        "order_id": order_id,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def prerender_status_emails(messages, new_status, cancellation_reason=None):
+    """Render the status emails among outbox messages in one batch and store them on the messages"""
+    emails = [message for message in messages if message['kind'] == 'order_status_email']
+    if not emails:
+        return
+    rendered = render_order_status_emails([message['payload']['order_data'] for message in emails], new_status, cancellation_reason)
+    for message, (subject, html_content) in zip(emails, rendered):
+        # The payload dict is shared with the order's WhatsApp message, so copy it
+        message['payload'] = dict(message['payload'], subject=subject, html=html_content)
+
+def enqueue_notifications(messages, session=None):
+    """Insert outbox messages (inside the caller's transaction when session is given)"""
+    if not messages:
+        return
+    notification_outbox_collection.insert_many(messages, ordered=False, session=session)
+
+def wake_notification_workers():
+    """Make sure this process has workers running and nudge them to poll now"""
+    start_notification_workers()
+    _notification_wakeup.set()
+
+def run_in_transaction(callback):
+    """Run callback(session) inside a MongoDB transaction, retrying transient errors"""
+    with client.start_session() as session:
+        return session.with_transaction(callback)
+
+def notification_retry_delay(attempts):
+    """Exponential backoff: 30s, 60s, 120s, ... capped at one hour"""
+    return min(NOTIFICATION_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), NOTIFICATION_RETRY_MAX_SECONDS)
+
+def claim_notification():
+    """Atomically claim the next due message (or one whose lease expired)"""
+    now = datetime.datetime.utcnow()
+    return notification_outbox_collection.find_one_and_update(
+        {"$or": [
+            {"status": {"$in": ["pending", "retrying"]}, "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "locked_until": {"$lte": now}}
+        ]},
+        {
+            "$set": {
+                "status": "sending",
+                "locked_until": now + datetime.timedelta(seconds=NOTIFICATION_LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("next_attempt_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def deliver_notification(message):
+    """Send one claimed message and record the outcome on its outbox document"""
+    channel, sender = NOTIFICATION_HANDLERS.get(message.get('kind'), (message.get('channel'), None))
+    now = datetime.datetime.utcnow()
+    update = {"updated_at": now}
+    
+    if sender is None:
+        update.update({"status": "failed", "last_error": f"Unknown notification kind: {message.get('kind')}"})
+    elif not notification_channel_configured(channel):
+        update.update({"status": "skipped", "last_error": f"{channel} service not configured"})
+    else:
+        try:
+            result = sender(message.get('payload') or {}, message['to'])
+        except Exception as e:
+            result = {"success": False, "message": str(e)}
+        
+        if result.get('vendor_ms') is not None:
+            update["vendor_ms"] = result['vendor_ms']
+        
+        if result.get('success'):
+            update.update({"status": "sent", "sent_at": now, "result": result})
+        elif message['attempts'] >= NOTIFICATION_MAX_ATTEMPTS:
+            update.update({"status": "failed", "last_error": result.get('message')})
+        else:
+            delay = notification_retry_delay(message['attempts'])
+            update.update({
+                "status": "retrying",
+                "last_error": result.get('message'),
+                "next_attempt_at": now + datetime.timedelta(seconds=delay)
+            })
+    
+    notification_outbox_collection.update_one(
+        {"_id": message['_id']},
+        {"$set": update, "$unset": {"locked_until": ""}}
+    )
+    if update['status'] == 'failed':
+        logger.error(f"❌ Notification {message['_id']} ({message.get('kind')}) failed after {message['attempts']} attempts: {update.get('last_error')}")
+    elif update['status'] == 'retrying':
+        logger.warning(f"⚠️ Notification {message['_id']} ({message.get('kind')}) will retry: {update.get('last_error')}")
+    return update['status']
+
+def notification_worker_loop():
+    """Drain the outbox until it is empty, then sleep until woken or polled"""
+    while True:
+        try:
+            message = claim_notification()
+            if message is None:
+                _notification_wakeup.wait(NOTIFICATION_POLL_SECONDS)
+                _notification_wakeup.clear()
+                continue
+            deliver_notification(message)
+        except Exception as e:
+            logger.error(f"❌ Notification worker error: {e}")
+            time.sleep(NOTIFICATION_POLL_SECONDS)
+
+def start_notification_workers():
+    """Start the worker pool once per process (gunicorn forks after import with --preload)"""
+    global _notification_workers_pid, _notification_wakeup
+    if _notification_workers_pid == os.getpid() or notification_outbox_collection is None:
+        return
+    with _notification_workers_lock:
+        if _notification_workers_pid == os.getpid():
+            return
+        _notification_wakeup = threading.Event()
+        for i in range(max(NOTIFICATION_WORKERS, 1)):
+            threading.Thread(target=notification_worker_loop, name=f"notification-worker-{i}", daemon=True).start()
+        _notification_workers_pid = os.getpid()
+        logger.info(f"✅ Started {max(NOTIFICATION_WORKERS, 1)} notification workers")
+
+start_notification_workers()
+
 # Security decorator for admin routes
 def admin_required(f):
     @wraps(f)
@@ -747,7 +1388,9 @@ def register_user():
             "phone": phone,
             "password": hashed_password,
             "created_at": datetime.datetime.utcnow(),
-            "role": "customer"
+            "role": "customer",
+            "order_count": 0,
+            "total_spent": 0
         }
         
         inserted_user = users_collection.insert_one(new_user)
@@ -939,76 +1582,376 @@ def reset_password():
         logger.error(f"❌ Reset password error: {e}")
         return jsonify({"success": False, "message": "An error occurred. Please try again later."}), 500
 
-# Submit Order
-@app.route('/submit-order', methods=['POST'])
-@limiter.limit("10 per minute")
-def submit_order():
-    """Submit a new order"""
-    try:
-        if orders_collection is None:
-            return jsonify({"success": False, "message": "Database connection not available."}), 500
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({"success": False, "message": "No data provided."}), 400
-        
-        # Validate required fields
-        required_fields = ['customer', 'items', 'total']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"success": False, "message": f"Missing required field: {field}"}), 400
-        
-        # Validate customer info
-        customer = data['customer']
-        customer_fields = ['name', 'phone', 'address']
-        if not isinstance(customer, dict) or not all(field in customer and customer[field] for field in customer_fields):
-            return jsonify({"success": False, "message": "Missing or incomplete customer details."}), 400
-        
-        # Validate items
-        if not data['items'] or not isinstance(data['items'], list):
-            return jsonify({"success": False, "message": "Order must contain items."}), 400
-        
-        # Sanitize customer info
-        sanitized_customer = {
-            "name": sanitize_string(customer['name']),
-            "phone": customer['phone'],
-            "address": sanitize_string(customer['address'])
-        }
-        
+# ========== ORDER PRICING ==========
+# Checkout reprices the cart on the server. Prices, names and stock come from an
+# index built off the cached catalog snapshot (rebuilt only when the catalog
+# version changes); products missing from it are fetched with one $in query.
+DELIVERY_FEE = float(os.environ.get('DELIVERY_FEE', 40))
+FREE_DELIVERY_THRESHOLD = float(os.environ.get('FREE_DELIVERY_THRESHOLD', 500))
+PRICE_TOLERANCE = 0.01  # Client and server totals may differ by float rounding only
+
+_price_index = None
+_price_index_lock = threading.Lock()
+
+class PricingError(Exception):
+    """Cart could not be priced as submitted; carries details for the client"""
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or {}
+
+def _price_entry(product):
+    return {"price": product.get('price'), "name": product.get('name'), "stock": product.get('stock')}
+
+def get_price_index():
+    """str(product_id) -> {price, name, stock} for the current catalog snapshot"""
+    global _price_index
+    catalog = get_cached_content('catalog', build_catalog_snapshot)
+    index = _price_index
+    if index is not None and index['version'] == catalog['version']:
+        return index['products']
+    with _price_index_lock:
+        if _price_index is None or _price_index['version'] != catalog['version']:
+            _price_index = {
+                "version": catalog['version'],
+                "products": {str(p['_id']): _price_entry(p) for p in catalog['payload']['products']}
+            }
+        return _price_index['products']
+
+def lookup_prices(product_ids):
+    """Resolve parsed product ids against the price index, falling back to one $in query"""
+    index = get_price_index()
+    prices = {}
+    missing = []
+    for product_id in product_ids:
+        entry = index.get(str(product_id))
+        if entry is None:
+            missing.append(product_id)
+        else:
+            prices[str(product_id)] = entry
+    if missing:
+        for product in products_collection.find({"_id": {"$in": missing}}, {"price": 1, "name": 1, "stock": 1}):
+            prices[str(product['_id'])] = _price_entry(product)
+    return prices
+
+def calculate_offer_discount(offer, cart_total):
+    """Discount an offer gives on cart_total (0 if the minimum purchase is not met)"""
+    if cart_total < offer.get('min_purchase', 0):
+        return 0
+    if offer['discount_type'] == 'percentage':
+        discount_amount = (cart_total * offer['discount_value']) / 100
+        max_discount = offer.get('max_discount', None)
+        if max_discount and discount_amount > max_discount:
+            discount_amount = max_discount
+    else:  # fixed
+        discount_amount = offer['discount_value']
+    # Ensure discount doesn't exceed cart total
+    return min(discount_amount, cart_total)
+
+def offer_is_live(offer, now=None):
+    """Active and not past its end date"""
+    now = now or datetime.datetime.utcnow()
+    end_date = offer.get('end_date')
+    return offer.get('active') and (end_date is None or not isinstance(end_date, datetime.datetime) or end_date >= now)
+
+def find_live_offer(discount_source):
+    """Match the checkout's discount_source against the cached active offers"""
+    if not isinstance(discount_source, dict):
+        return None
+    offers = get_cached_content('offers', build_active_offers_snapshot)['payload']['offers']
+    source_type = discount_source.get('type')
+    for offer in offers:
+        if offer.get('offer_type', 'automatic') != source_type or not offer_is_live(offer):
+            continue
+        if source_type == 'promo_code' and offer.get('code') == str(discount_source.get('code', '')).upper().strip():
+            return offer
+        if source_type == 'automatic' and str(offer['_id']) == str(discount_source.get('offer_id')):
+            return offer
+    return None
+
+def price_order(items, discount_source=None):
+    """
+    Reprice submitted cart items. Returns (priced_items, pricing, reservations) where
+    pricing holds subtotal, discount, discount_source, delivery_fee and total_amount,
+    and reservations lists {"id", "quantity"} for every stock-tracked product.
+    Raises PricingError for unknown products or quantities above stock.
+    """
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise PricingError("Invalid order item.")
+        quantity = item.get('quantity')
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            raise PricingError(f"Invalid quantity for {item.get('name', 'item')}.")
+        try:
+            parsed.append((item, parse_product_id(item.get('id'))))
+        except ValueError:
+            raise PricingError(f"Unknown product: {item.get('name', item.get('id'))}.")
+    
+    prices = lookup_prices({product_id for _, product_id in parsed})
+    priced_items = []
+    unavailable = []
+    requested = {}
+    subtotal = 0
+    for item, product_id in parsed:
+        entry = prices.get(str(product_id))
+        if entry is None or not isinstance(entry['price'], (int, float)):
+            raise PricingError(f"Unknown product: {item.get('name', item.get('id'))}.")
+        requested[str(product_id)] = requested.get(str(product_id), 0) + item['quantity']
+        stock = entry.get('stock')
+        if isinstance(stock, (int, float)) and requested[str(product_id)] > stock:
+            unavailable.append({"id": item.get('id'), "name": entry['name'], "available": max(stock, 0)})
+        priced_items.append(dict(item, name=entry['name'] or item.get('name'), price=entry['price']))
+        subtotal += entry['price'] * item['quantity']
+    
+    reservations = [
+        {"id": product_id, "quantity": requested[str(product_id)]}
+        for product_id in dict.fromkeys(product_id for _, product_id in parsed)
+        if isinstance(prices[str(product_id)].get('stock'), (int, float))
+    ]
+    
+    if unavailable:
+        raise PricingError("Some items are not available in the requested quantity.", {"unavailable": unavailable})
+    
+    discount = 0
+    applied_source = None
+    offer = find_live_offer(discount_source) if subtotal > 0 else None
+    if offer is not None:
+        discount = round(calculate_offer_discount(offer, subtotal), 2)
+        if discount > 0:
+            applied_source = {
+                "type": offer.get('offer_type', 'automatic'),
+                "code": offer.get('code'),
+                "title": offer.get('title'),
+                "offer_id": str(offer['_id'])
+            }
+        else:
+            discount = 0
+    
+    subtotal_after_discount = max(0, subtotal - discount)
+    delivery_fee = 0 if subtotal == 0 or subtotal_after_discount >= FREE_DELIVERY_THRESHOLD else DELIVERY_FEE
+    
+    pricing = {
+        "subtotal": round(subtotal, 2),
+        "discount": discount,
+        "discount_source": applied_source,
+        "delivery_fee": delivery_fee,
+        "total_amount": round(subtotal_after_discount + delivery_fee, 2)
+    }
+    return priced_items, pricing, reservations
+
+# ========== STOCK RESERVATIONS ==========
+# Checkout reserves stock for stock-tracked products with conditional $inc updates
+# (stock >= quantity) in the same transaction as the order insert, so the last
+# units can only be sold once. An order's stock_reservation moves from "held" to
+# "consumed" (delivered), "released" (cancelled) or "expired" (left Pending too long).
+# Product documents are only locked for the short checkout transaction and
+# with_transaction retries write conflicts, which keeps contention low under load.
+STOCK_RESERVATION_HOURS = int(os.environ.get('STOCK_RESERVATION_HOURS', 48))
+RESERVATION_EXPIRY_INTERVAL_SECONDS = 600
+
+_reservation_expirer_pid = None
+
+def find_unavailable_items(reservations):
+    """Committed stock levels that cannot cover the requested quantities"""
+    quantities = {reservation['id']: reservation['quantity'] for reservation in reservations}
+    unavailable = []
+    for product in products_collection.find({"_id": {"$in": list(quantities)}}, {"name": 1, "stock": 1}):
+        stock = product.get('stock')
+        if isinstance(stock, (int, float)) and stock < quantities[product['_id']]:
+            unavailable.append({"id": product['_id'], "name": product.get('name'), "available": max(stock, 0)})
+    return unavailable
+
+def reserve_stock(reservations, session=None):
+    """
+    Take every reservation in one unordered bulk_write of conditional decrements.
+    Raises PricingError (aborting the caller's transaction) if any product is short.
+    """
+    if not reservations:
+        return
+    # A consistent product order keeps concurrent checkouts from conflicting in varying orders
+    ordered = sorted(reservations, key=lambda reservation: str(reservation['id']))
+    result = products_collection.bulk_write(
+        [UpdateOne({"_id": r['id'], "stock": {"$gte": r['quantity']}}, {"$inc": {"stock": -r['quantity']}}) for r in ordered],
+        ordered=False,
+        session=session
+    )
+    if result.matched_count < len(ordered):
+        # Read committed stock outside the transaction to tell the customer what is short
+        raise PricingError(
+            "Some items are not available in the requested quantity.",
+            {"unavailable": find_unavailable_items(ordered)}
+        )
+
+def build_stock_reservation(reservations, now):
+    return {
+        "status": "held",
+        "items": reservations,
+        "reserved_at": now,
+        "expires_at": now + datetime.timedelta(hours=STOCK_RESERVATION_HOURS),
+        "updated_at": now
+    }
+
+def expire_stock_reservations():
+    """Release stock held by Pending orders whose reservation has expired"""
+    def expire_next(session):
+        now = datetime.datetime.utcnow()
+        # Claiming with find_one_and_update makes each release happen exactly once across workers
+        order = orders_collection.find_one_and_update(
+            {"status": "Pending", "stock_reservation.status": "held", "stock_reservation.expires_at": {"$lt": now}},
+            {"$set": {"stock_reservation.status": "expired", "stock_reservation.updated_at": now}},
+            projection={"stock_reservation": 1},
+            session=session
+        )
+        if order is not None:
+            adjust_stock_for_items(order['stock_reservation'].get('items'), 1, session=session)
+        return order
+    
+    expired = 0
+    # The claim and the stock release commit together, so a crash cannot lose the release
+    while run_in_transaction(expire_next) is not None:
+        expired += 1
+    
+    if expired:
+        bump_content_version('catalog')
+        logger.info(f"⏰ Released stock for {expired} expired reservations")
+    return expired
+
+def reservation_expirer_loop():
+    while True:
+        time.sleep(RESERVATION_EXPIRY_INTERVAL_SECONDS)
+        try:
+            expire_stock_reservations()
+        except Exception as e:
+            logger.error(f"❌ Error expiring stock reservations: {e}")
+
+def start_reservation_expirer():
+    """Start the reservation expiry thread once per process"""
+    global _reservation_expirer_pid
+    if _reservation_expirer_pid == os.getpid() or orders_collection is None:
+        return
+    _reservation_expirer_pid = os.getpid()
+    threading.Thread(target=reservation_expirer_loop, name="reservation-expirer", daemon=True).start()
+
+start_reservation_expirer()
+
+# Submit Order
+@app.route('/submit-order', methods=['POST'])
+@limiter.limit("10 per minute")
+def submit_order():
+    """Submit a new order"""
+    try:
+        if orders_collection is None:
+            return jsonify({"success": False, "message": "Database connection not available."}), 500
+        
+        data = request.get_json()
+        if not data:
+            return jsonify({"success": False, "message": "No data provided."}), 400
+        
+        # Validate required fields
+        required_fields = ['customer', 'items', 'total']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({"success": False, "message": f"Missing required field: {field}"}), 400
+        
+        # Validate customer info
+        customer = data['customer']
+        customer_fields = ['name', 'phone', 'address']
+        if not isinstance(customer, dict) or not all(field in customer and customer[field] for field in customer_fields):
+            return jsonify({"success": False, "message": "Missing or incomplete customer details."}), 400
+        
+        # Validate items
+        if not data['items'] or not isinstance(data['items'], list):
+            return jsonify({"success": False, "message": "Order must contain items."}), 400
+        
+        # Sanitize customer info
+        sanitized_customer = {
+            "name": sanitize_string(customer['name']),
+            "phone": customer['phone'],
+            "address": sanitize_string(customer['address'])
+        }
+        
         # Add email if provided
         if customer.get('email'):
             sanitized_customer['email'] = customer['email'].strip().lower()
         
+        # Reprice the cart on the server; the client's totals are only a cross-check
+        try:
+            priced_items, pricing, reservations = price_order(data['items'], data.get('discount_source'))
+        except PricingError as e:
+            return jsonify({"success": False, "message": str(e), **e.details}), 409
+        
+        try:
+            client_total = float(data['total'])
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "message": "Invalid order total."}), 400
+        if abs(client_total - pricing['total_amount']) > PRICE_TOLERANCE:
+            logger.warning(f"⚠️ Order total mismatch: client {client_total}, server {pricing['total_amount']}")
+            return jsonify({
+                "success": False,
+                "message": "Prices or offers in your cart have changed. Please review your cart and try again.",
+                "pricing": pricing,
+                "items": priced_items
+            }), 409
+        
         # Create order
         new_order = {
+            "_id": ObjectId(),
             "customer_info": sanitized_customer,
-            "items": data['items'],
-            "subtotal": data.get('subtotal'),
-            "delivery_fee": data.get('deliveryFee', 0),
-            "total_amount": data['total'],
+            "items": priced_items,
+            "subtotal": pricing['subtotal'],
+            "discount": pricing['discount'],
+            "discount_source": pricing['discount_source'],
+            "delivery_fee": pricing['delivery_fee'],
+            "total_amount": pricing['total_amount'],
             "order_date": datetime.datetime.utcnow(),
             "status": "Pending",
-            "user_id": data.get('user_id')
+            "user_id": data.get('user_id'),
+            "customer_counted": True
         }
+        new_order["sales_rollup"] = order_sales_contribution(new_order)
+        # Recorded even when nothing is stock-tracked, so status changes never fall back to
+        # deducting every item the way orders from before reservations do
+        new_order["stock_reservation"] = build_stock_reservation(reservations, new_order['order_date'])
         
-        inserted_order = orders_collection.insert_one(new_order)
-        order_id = str(inserted_order.inserted_id)
+        order_id = str(new_order['_id'])
+        notifications = []
         
-        # Send order confirmation email if customer email is provided
+        # Queue order confirmation email if customer email is provided
         if sanitized_customer.get('email') and validate_email(sanitized_customer.get('email', '')):
             order_email_data = {
                 "order_id": order_id,
                 "customer_name": sanitized_customer['name'],
                 "customer_phone": sanitized_customer['phone'],
                 "customer_address": sanitized_customer['address'],
-                "items": data['items'],
-                "subtotal": data.get('subtotal', 0),
-                "delivery_fee": data.get('deliveryFee', 0),
-                "total_amount": data['total'],
+                "items": priced_items,
+                "subtotal": pricing['subtotal'],
+                "delivery_fee": pricing['delivery_fee'],
+                "total_amount": pricing['total_amount'],
                 "order_date": datetime.datetime.utcnow().strftime('%B %d, %Y at %I:%M %p')
             }
-            send_order_confirmation_email(order_email_data, sanitized_customer['email'])
-            send_order_confirmation_whatsapp(order_email_data, sanitized_customer['phone'])
+            payload = {"order_data": order_email_data}
+            notifications.append(build_notification('order_confirmation_email', sanitized_customer['email'], payload, order_id))
+            notifications.append(build_notification('order_confirmation_whatsapp', sanitized_customer['phone'], payload, order_id))
+        
+        # Stock reservation, the order, customer counters, its sales rollup event and
+        # notifications are committed together
+        def place_order(session):
+            reserve_stock(reservations, session=session)
+            orders_collection.insert_one(new_order, session=session)
+            apply_customer_counter_updates([customer_counter_update(new_order)], session=session)
+            enqueue_sales_rollups([sales_rollup_event(new_order, None, new_order['sales_rollup'])], session=session)
+            enqueue_notifications(notifications, session=session)
+        
+        try:
+            run_in_transaction(place_order)
+        except PricingError as e:
+            return jsonify({"success": False, "message": str(e), **e.details}), 409
+        # Reserved units leave the stock shown on the storefront and checked by price_order
+        if reservations:
+            bump_content_version('catalog')
+        wake_rollup_worker()
+        if notifications:
+            wake_notification_workers()
         
         logger.info(f"✅ Order placed: {order_id}")
         return jsonify({
@@ -1066,25 +2009,295 @@ def update_cart():
         logger.error(f"❌ Error updating cart: {e}")
         return jsonify({"success": False, "message": "An error occurred while updating the cart."}), 500
 
+# ========== ORDER ARCHIVE ==========
+# Delivered and Cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS are moved from
+# orders to orders_archive, keeping the hot collection and its indexes small.
+# app_meta["orders_archive"].archived_before is a watermark: the archive only holds
+# orders placed before it, so reads whose range ends after it never touch the archive.
+ORDER_ARCHIVE_META_ID = "orders_archive"
+ORDER_ARCHIVE_LOCK_ID = "orders_archive_lock"
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 365))
+ORDER_ARCHIVE_BATCH_SIZE = 500
+ORDER_ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('ORDER_ARCHIVE_INTERVAL_HOURS', 24)) * 3600
+ORDER_ARCHIVE_LOCK_SECONDS = 3600
+ARCHIVABLE_ORDER_STATUSES = ['Delivered', 'Cancelled']
+
+_archive_watermark = None
+_archive_watermark_checked_at = float('-inf')
+_order_archiver_pid = None
+
+def get_archive_watermark():
+    """Orders placed before this may be archived (None if nothing was ever archived)"""
+    global _archive_watermark, _archive_watermark_checked_at
+    if time.monotonic() - _archive_watermark_checked_at >= CONTENT_VERSION_CHECK_SECONDS:
+        try:
+            meta = meta_collection.find_one({"_id": ORDER_ARCHIVE_META_ID}, {"archived_before": 1})
+            _archive_watermark = (meta or {}).get('archived_before')
+        except Exception as e:
+            logger.warning(f"⚠️ Could not refresh order archive watermark: {e}")
+        _archive_watermark_checked_at = time.monotonic()
+    return _archive_watermark
+
+def order_sort_key(order):
+    return (order.get('order_date') or datetime.datetime.min, order['_id'])
+
+def merge_order_streams(cursors, descending=False):
+    """Lazily merge order cursors that are each sorted by (order_date, _id)"""
+    try:
+        yield from heapq.merge(*cursors, key=order_sort_key, reverse=descending)
+    finally:
+        for cursor in cursors:
+            cursor.close()
+
+def find_orders_page(query, projection, limit, cursor_condition=None):
+    """
+    Newest-first page of up to limit + 1 orders across the hot and archive collections.
+    The archive is only queried when the page reaches back past the watermark.
+    """
+    if cursor_condition:
+        query = {"$and": [query, cursor_condition]} if query else cursor_condition
+    orders = list(orders_collection.find(query, projection).sort(ORDER_LIST_SORT).limit(limit + 1))
+    
+    watermark = get_archive_watermark()
+    if watermark is not None and (len(orders) <= limit or (orders[-1].get('order_date') or watermark) < watermark):
+        archived = list(orders_archive_collection.find(query, projection).sort(ORDER_LIST_SORT).limit(limit + 1))
+        if archived:
+            orders = list(heapq.merge(orders, archived, key=order_sort_key, reverse=True))[:limit + 1]
+    return orders
+
+def find_order_by_id(order_id):
+    """Look an order up in the hot collection, then the archive"""
+    order = orders_collection.find_one({"_id": order_id})
+    if order is None and get_archive_watermark() is not None:
+        order = orders_archive_collection.find_one({"_id": order_id})
+    return order
+
+def acquire_meta_lock(lock_id, seconds):
+    """Take a cross-worker lease stored in app_meta; False if another process holds it"""
+    now = datetime.datetime.utcnow()
+    try:
+        meta_collection.find_one_and_update(
+            {"_id": lock_id, "$or": [{"locked_until": {"$lt": now}}, {"locked_until": {"$exists": False}}]},
+            {"$set": {"locked_until": now + datetime.timedelta(seconds=seconds), "pid": os.getpid()}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+def release_meta_lock(lock_id):
+    meta_collection.update_one({"_id": lock_id}, {"$unset": {"locked_until": ""}})
+
+def acquire_archive_lock():
+    """Take the cross-worker archive lease; False if another process holds it"""
+    return acquire_meta_lock(ORDER_ARCHIVE_LOCK_ID, ORDER_ARCHIVE_LOCK_SECONDS)
+
+def release_archive_lock():
+    release_meta_lock(ORDER_ARCHIVE_LOCK_ID)
+
+def archive_old_orders(older_than_days=None):
+    """
+    Move archivable orders placed before the cutoff into orders_archive in batches.
+    Each batch is copied and deleted in one transaction. Returns the number moved.
+    """
+    older_than_days = ORDER_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=older_than_days)
+    started_at = datetime.datetime.utcnow()
+    
+    # Publish the watermark first and let every worker pick it up before anything
+    # moves, so no read skips the archive while orders are in flight
+    previous = meta_collection.find_one_and_update(
+        {"_id": ORDER_ARCHIVE_META_ID},
+        {"$max": {"archived_before": cutoff}},
+        upsert=True
+    )
+    if (previous or {}).get('archived_before') is None or previous['archived_before'] < cutoff:
+        time.sleep(CONTENT_VERSION_CHECK_SECONDS + 1)
+    
+    moved = 0
+    query = {"status": {"$in": ARCHIVABLE_ORDER_STATUSES}, "order_date": {"$lt": cutoff}}
+    while True:
+        batch_ids = [order['_id'] for order in orders_collection.find(query, {"_id": 1}).sort("order_date", ASCENDING).limit(ORDER_ARCHIVE_BATCH_SIZE)]
+        if not batch_ids:
+            break
+        
+        def move_batch(session):
+            # Re-read inside the transaction so an order whose status just changed stays hot
+            orders = list(orders_collection.find({"_id": {"$in": batch_ids}, **query}, session=session))
+            if not orders:
+                return 0
+            orders_archive_collection.bulk_write(
+                [ReplaceOne({"_id": order['_id']}, order, upsert=True) for order in orders],
+                ordered=False,
+                session=session
+            )
+            orders_collection.delete_many({"_id": {"$in": [order['_id'] for order in orders]}}, session=session)
+            return len(orders)
+        
+        batch_moved = run_in_transaction(move_batch)
+        if batch_moved == 0:
+            break
+        moved += batch_moved
+    
+    meta_collection.update_one(
+        {"_id": ORDER_ARCHIVE_META_ID},
+        {"$set": {"last_run": {
+            "started_at": started_at,
+            "finished_at": datetime.datetime.utcnow(),
+            "cutoff": cutoff,
+            "moved": moved
+        }}}
+    )
+    logger.info(f"🗄️ Archived {moved} orders placed before {cutoff.date()}")
+    return moved
+
+def run_order_archive_job(older_than_days=None, lock_held=False):
+    """Run one archive pass under the cross-worker lease"""
+    if not lock_held and not acquire_archive_lock():
+        return None
+    try:
+        return archive_old_orders(older_than_days)
+    except Exception as e:
+        logger.error(f"❌ Order archive job failed: {e}")
+        return None
+    finally:
+        release_archive_lock()
+
+def order_archiver_loop():
+    while True:
+        time.sleep(ORDER_ARCHIVE_INTERVAL_SECONDS)
+        run_order_archive_job()
+
+def start_order_archiver():
+    """Start the periodic archiver once per process (disabled with ORDER_ARCHIVE_INTERVAL_HOURS=0)"""
+    global _order_archiver_pid
+    if ORDER_ARCHIVE_INTERVAL_SECONDS <= 0 or _order_archiver_pid == os.getpid() or orders_archive_collection is None:
+        return
+    _order_archiver_pid = os.getpid()
+    threading.Thread(target=order_archiver_loop, name="order-archiver", daemon=True).start()
+
+start_order_archiver()
+
+# Admin: Archive Old Orders
+@app.route('/admin/orders/archive', methods=['POST'])
+@admin_required
+@limiter.limit("5 per hour")
+def start_order_archive():
+    """Start an archive pass in the background (admin only); optional older_than_days"""
+    try:
+        data = request.get_json(silent=True) or {}
+        older_than_days = data.get('older_than_days', ORDER_ARCHIVE_AFTER_DAYS)
+        if isinstance(older_than_days, bool) or not isinstance(older_than_days, int) or older_than_days < 30:
+            return jsonify({"success": False, "message": "older_than_days must be a whole number of at least 30."}), 400
+        
+        if not acquire_archive_lock():
+            return jsonify({"success": False, "message": "An archive job is already running."}), 409
+        
+        threading.Thread(
+            target=run_order_archive_job,
+            kwargs={"older_than_days": older_than_days, "lock_held": True},
+            name="order-archive-manual",
+            daemon=True
+        ).start()
+        
+        logger.info(f"🗄️ Order archive started by {request.headers.get('User-ID')} (older than {older_than_days} days)")
+        return jsonify({"success": True, "message": "Archive job started."}), 202
+        
+    except Exception as e:
+        logger.error(f"❌ Error starting order archive: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# Admin: Order Archive Status
+@app.route('/admin/orders/archive', methods=['GET'])
+@admin_required
+def get_order_archive_status():
+    """Watermark, last run and collection sizes of the order archive (admin only)"""
+    try:
+        meta = meta_collection.find_one({"_id": ORDER_ARCHIVE_META_ID}) or {}
+        lock = meta_collection.find_one({"_id": ORDER_ARCHIVE_LOCK_ID}) or {}
+        return jsonify({
+            "success": True,
+            "archived_before": meta.get('archived_before'),
+            "last_run": meta.get('last_run'),
+            "running": bool(lock.get('locked_until') and lock['locked_until'] > datetime.datetime.utcnow()),
+            "hot_orders": orders_collection.estimated_document_count(),
+            "archived_orders": orders_archive_collection.estimated_document_count()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"❌ Error fetching order archive status: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# Order history list view: enough to render a row, without items or status_history
+ORDER_SUMMARY_PROJECTION = {
+    "order_date": 1,
+    "status": 1,
+    "subtotal": 1,
+    "discount": 1,
+    "delivery_fee": 1,
+    "total_amount": 1,
+    "delivered_date": 1,
+    "cancellation_reason": 1,
+    "item_count": {"$size": {"$ifNull": ["$items", []]}}
+}
+ORDER_HISTORY_PARAMS = ('limit', 'cursor', 'view')
+ORDER_LIST_SORT = [("order_date", DESCENDING), ("_id", DESCENDING)]  # _id breaks order_date ties
+
+def order_keyset_condition(cursor):
+    """Condition for orders after a (order_date, _id) cursor in newest-first order"""
+    last_date, last_id = decode_cursor_pair(cursor)
+    return {"$or": [
+        {"order_date": {"$lt": last_date}},
+        {"order_date": last_date, "_id": {"$lt": last_id}}
+    ]}
+
+def list_user_orders_page(user_id, args):
+    """
+    Return one page of a customer's orders, newest first, walking the
+    (user_id, order_date, _id) index. ?view=summary drops items and status_history.
+    Raises ValueError on bad input.
+    """
+    view = args.get('view', 'full')
+    if view not in ('full', 'summary'):
+        raise ValueError("view must be 'full' or 'summary'.")
+    
+    cursor_condition = order_keyset_condition(args['cursor']) if args.get('cursor') else None
+    limit = parse_page_limit(args, default=20)
+    projection = ORDER_SUMMARY_PROJECTION if view == 'summary' else None
+    orders = find_orders_page({"user_id": user_id}, projection, limit, cursor_condition)
+    
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    next_cursor = encode_cursor([orders[-1].get('order_date'), orders[-1]['_id']]) if has_more else None
+    
+    return {
+        "success": True,
+        "orders": orders,
+        "count": len(orders),
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }
+
 # Get User Orders
 @app.route('/orders/<user_id>', methods=['GET'])
 def get_user_orders(user_id):
-    """Get all orders for a user"""
+    """Get orders for a user (all of them, or one page with ?limit=/?cursor=/?view=summary)"""
     try:
         if orders_collection is None:
             return jsonify({"success": False, "message": "Database connection not available."}), 500
         
-        orders_cursor = orders_collection.find({"user_id": user_id}).sort("order_date", -1)
-        orders_list = []
+        if any(param in request.args for param in ORDER_HISTORY_PARAMS):
+            return jsonify(list_user_orders_page(user_id, request.args)), 200
         
-        for order in orders_cursor:
-            order['_id'] = str(order['_id'])
-            if 'order_date' in order and isinstance(order['order_date'], datetime.datetime):
-                order['order_date'] = order['order_date'].isoformat()
-            orders_list.append(order)
+        cursors = [orders_collection.find({"user_id": user_id}).sort(ORDER_LIST_SORT)]
+        if get_archive_watermark() is not None:
+            cursors.append(orders_archive_collection.find({"user_id": user_id}).sort(ORDER_LIST_SORT))
+        orders_list = list(merge_order_streams(cursors, descending=True))
         
         return jsonify({"success": True, "orders": orders_list}), 200
         
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         logger.error(f"❌ Error fetching orders for user {user_id}: {e}")
         return jsonify({"success": False, "message": "An error occurred while fetching orders."}), 500
@@ -1218,6 +2431,7 @@ def upload_profile_picture():
         )
         
         if update_result.matched_count > 0:
+            bump_content_version('reviews')  # Featured reviews show profile pictures
             logger.info(f"✅ Profile picture updated for user: {user_id}")
             return jsonify({
                 "success": True,
@@ -1261,6 +2475,7 @@ def update_profile_picture():
         )
         
         if update_result.matched_count > 0:
+            bump_content_version('reviews')  # Featured reviews show profile pictures
             logger.info(f"✅ Profile picture updated for user: {user_id}")
             return jsonify({"success": True, "message": "Profile picture updated successfully."}), 200
         else:
@@ -1528,6 +2743,30 @@ def submit_order_review():
         logger.error(f"❌ Error submitting review: {e}")
         return jsonify({"success": False, "message": "An error occurred while submitting the review."}), 500
 
+# Attach reviewer profile pictures with a single users lookup
+def attach_review_authors(reviews, fill_names=False):
+    """Set user_profile_picture (and optionally user_name) on each review in place"""
+    user_ids = set()
+    for review in reviews:
+        try:
+            if review.get('user_id'):
+                user_ids.add(ObjectId(review['user_id']))
+        except Exception:
+            logger.warning(f"Could not parse user_id for review {review['_id']}")
+    
+    users = {}
+    if user_ids:
+        projection = {"profile_picture": 1, "name": 1} if fill_names else {"profile_picture": 1}
+        for user in users_collection.find({"_id": {"$in": list(user_ids)}}, projection):
+            users[str(user['_id'])] = user
+    
+    for review in reviews:
+        user = users.get(str(review.get('user_id') or ''))
+        review['user_profile_picture'] = user.get('profile_picture', '') if user else ''
+        # Fallback to user name from users collection if not in review
+        if fill_names and user and not review.get('user_name') and user.get('name'):
+            review['user_name'] = user.get('name')
+
 # Get Reviews (Admin)
 @app.route('/admin/reviews', methods=['GET'])
 @admin_required
@@ -1541,25 +2780,7 @@ def get_all_reviews():
         reviews = list(reviews_collection.find({}).sort("created_at", -1))
         
         # Enrich reviews with user profile pictures
-        for review in reviews:
-            review['_id'] = str(review['_id'])
-            if isinstance(review.get('created_at'), datetime.datetime):
-                review['created_at'] = review['created_at'].isoformat()
-            
-            # Fetch user profile picture if user_id exists
-            if review.get('user_id'):
-                try:
-                    user = users_collection.find_one(
-                        {"_id": ObjectId(review['user_id'])},
-                        {"profile_picture": 1}
-                    )
-                    if user:
-                        review['user_profile_picture'] = user.get('profile_picture', '')
-                except Exception as e:
-                    logger.warning(f"Could not fetch user data for review {review['_id']}: {e}")
-                    review['user_profile_picture'] = ''
-            else:
-                review['user_profile_picture'] = ''
+        attach_review_authors(reviews)
         
         return jsonify({"success": True, "reviews": reviews}), 200
         
@@ -1591,6 +2812,7 @@ def feature_review():
         )
         
         if result.matched_count > 0:
+            bump_content_version('reviews')
             action = "featured" if featured else "unfeatured"
             logger.info(f"✅ Review {action}: {review_id}")
             return jsonify({"success": True, "message": f"Review {action} successfully!"}), 200
@@ -1601,6 +2823,20 @@ def feature_review():
         logger.error(f"❌ Error featuring review: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+# Build the featured review list served by GET /reviews/featured
+def build_featured_reviews_snapshot():
+    """Load featured reviews with user profile pictures"""
+    # Get featured reviews with rating 4 or 5, limit to 10
+    reviews = list(reviews_collection.find({
+        "featured": True,
+        "rating": {"$gte": 4}
+    }).sort("created_at", -1).limit(10))
+    
+    # Enrich reviews with user profile pictures
+    attach_review_authors(reviews, fill_names=True)
+    
+    return {"success": True, "reviews": reviews}
+
 # Get Featured Reviews (Public)
 @app.route('/reviews/featured', methods=['GET'])
 def get_featured_reviews():
@@ -1609,37 +2845,8 @@ def get_featured_reviews():
         if reviews_collection is None or users_collection is None:
             return jsonify({"success": False, "message": "Database connection not available."}), 500
         
-        # Get featured reviews with rating 4 or 5, limit to 10
-        reviews = list(reviews_collection.find({
-            "featured": True,
-            "rating": {"$gte": 4}
-        }).sort("created_at", -1).limit(10))
-        
-        # Enrich reviews with user profile pictures
-        for review in reviews:
-            review['_id'] = str(review['_id'])
-            if isinstance(review.get('created_at'), datetime.datetime):
-                review['created_at'] = review['created_at'].isoformat()
-            
-            # Fetch user profile picture if user_id exists
-            if review.get('user_id'):
-                try:
-                    user = users_collection.find_one(
-                        {"_id": ObjectId(review['user_id'])},
-                        {"profile_picture": 1, "name": 1}
-                    )
-                    if user:
-                        review['user_profile_picture'] = user.get('profile_picture', '')
-                        # Fallback to user name from users collection if not in review
-                        if not review.get('user_name') and user.get('name'):
-                            review['user_name'] = user.get('name')
-                except Exception as e:
-                    logger.warning(f"Could not fetch user data for review {review['_id']}: {e}")
-                    review['user_profile_picture'] = ''
-            else:
-                review['user_profile_picture'] = ''
-        
-        return jsonify({"success": True, "reviews": reviews}), 200
+        reviews = get_cached_content('reviews', build_featured_reviews_snapshot)
+        return cached_content_response(reviews)
         
     except Exception as e:
         logger.error(f"❌ Error fetching featured reviews: {e}")
@@ -1653,15 +2860,11 @@ def get_order_details(order_id):
         if orders_collection is None:
             return jsonify({"success": False, "message": "Database connection not available."}), 500
         
-        order_document = orders_collection.find_one({"_id": ObjectId(order_id)})
+        order_document = find_order_by_id(ObjectId(order_id))
         
         if not order_document:
             return jsonify({"success": False, "message": "Order not found."}), 404
         
-        order_document['_id'] = str(order_document['_id'])
-        if 'order_date' in order_document and isinstance(order_document['order_date'], datetime.datetime):
-            order_document['order_date'] = order_document['order_date'].isoformat()
-        
         return jsonify({
             "success": True,
             "message": "Order found",
@@ -1703,9 +2906,6 @@ def get_all_users():
         users = list(users_collection.find({}, {'password': 0}))
         
         for user in users:
-            user['_id'] = str(user['_id'])
-            if 'created_at' in user and isinstance(user['created_at'], datetime.datetime):
-                user['created_at'] = user['created_at'].isoformat()
             user['role'] = user.get('role', 'customer')
         
         return jsonify({"success": True, "users": users}), 200
@@ -1714,89 +2914,671 @@ def get_all_users():
         logger.error(f"❌ Error fetching all users: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+ADMIN_ORDER_PARAMS = ('limit', 'cursor', 'status', 'from', 'to', 'phone')
+
+def parse_date_param(value, end_of_day=False):
+    """Parse an ISO date/datetime query value; a bare date with end_of_day covers that whole day"""
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}. Use YYYY-MM-DD or an ISO 8601 datetime.")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    if end_of_day and len(value) == 10:
+        parsed += datetime.timedelta(days=1)
+    return parsed
+
+def build_admin_order_query(args):
+    """
+    Build the orders filter for ?status= (comma-separated), ?from= / ?to= (order_date,
+    inclusive dates) and ?phone= (exact customer phone). Raises ValueError on bad input.
+    """
+    query = {}
+    
+    if args.get('status'):
+        statuses = [status.strip() for status in args['status'].split(',') if status.strip()]
+        invalid = [status for status in statuses if status not in VALID_ORDER_STATUSES]
+        if invalid:
+            raise ValueError(f"Invalid status: {', '.join(invalid)}")
+        query['status'] = statuses[0] if len(statuses) == 1 else {"$in": statuses}
+    
+    date_range = {}
+    if args.get('from'):
+        date_range['$gte'] = parse_date_param(args['from'])
+    if args.get('to'):
+        to_date = parse_date_param(args['to'], end_of_day=True)
+        date_range['$lt' if len(args['to']) == 10 else '$lte'] = to_date
+    if date_range:
+        query['order_date'] = date_range
+    
+    if args.get('phone'):
+        query['customer_info.phone'] = args['phone'].strip()
+    
+    return query
+
+def list_admin_orders_page(args):
+    """Return one filtered page of orders, newest first (raises ValueError on bad input)"""
+    query = build_admin_order_query(args)
+    if args.get('cursor'):
+        query = {"$and": [query, order_keyset_condition(args['cursor'])]} if query else order_keyset_condition(args['cursor'])
+    
+    limit = parse_page_limit(args)
+    orders = list(orders_collection.find(query).sort(ORDER_LIST_SORT).limit(limit + 1))
+    
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    next_cursor = encode_cursor([orders[-1].get('order_date'), orders[-1]['_id']]) if has_more else None
+    
+    return {
+        "success": True,
+        "orders": orders,
+        "count": len(orders),
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }
+
 # Admin: Get All Orders
 @app.route('/admin/orders', methods=['GET'])
 @admin_required
 def get_all_orders():
-    """Get all orders (admin only)"""
+    """
+    Get orders (admin only). Filters: ?status=, ?from=, ?to=, ?phone=; pages with ?limit= / ?cursor=.
+    ?format=ndjson streams every matching order one per line; ?raw=1 streams them as one JSON array.
+    """
     try:
         if orders_collection is None:
             return jsonify({"success": False, "message": "Database connection not available."}), 500
         
-        orders = list(orders_collection.find({}).sort("order_date", -1))
+        if request.args.get('format') == 'ndjson':
+            query = build_admin_order_query(request.args)
+            return stream_ndjson(batched_find(orders_collection, query).sort(ORDER_LIST_SORT), filename="orders.ndjson")
         
-        for order in orders:
-            order['_id'] = str(order['_id'])
-            if 'order_date' in order and isinstance(order['order_date'], datetime.datetime):
-                order['order_date'] = order['order_date'].isoformat()
+        if wants_raw_stream(request.args):
+            query = build_admin_order_query(request.args)
+            return stream_json_array(batched_find(orders_collection, query).sort(ORDER_LIST_SORT), "orders")
+        
+        if any(param in request.args for param in ADMIN_ORDER_PARAMS):
+            return jsonify(list_admin_orders_page(request.args)), 200
+        
+        orders = list(orders_collection.find({}).sort(ORDER_LIST_SORT))
         
         return jsonify({"success": True, "orders": orders}), 200
         
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         logger.error(f"❌ Error fetching all orders: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
-# Admin: Get Dashboard Statistics
-@app.route('/admin/dashboard/stats', methods=['GET'])
+# ========== ORDER CSV EXPORT ==========
+ORDER_EXPORT_COLUMNS = ['order_id', 'order_date', 'status', 'customer_name', 'customer_phone', 'customer_email',
+                        'customer_address', 'user_id', 'item_count', 'subtotal', 'discount', 'discount_code',
+                        'delivery_fee', 'total_amount', 'delivered_date', 'cancellation_reason']
+ORDER_ITEM_EXPORT_COLUMNS = ['order_id', 'order_date', 'status', 'customer_name', 'customer_phone',
+                             'product_id', 'product_name', 'quantity', 'unit_price', 'line_total']
+ORDER_EXPORT_SORT = [("order_date", ASCENDING), ("_id", ASCENDING)]
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def csv_cell(value):
+    """Format a value for CSV; text that a spreadsheet would run as a formula is quoted with '"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES) and not re.fullmatch(r'[+-]?[\d\s.]+', value):
+        return "'" + value
+    return value
+
+def order_export_rows(order):
+    """CSV rows (lists) for one order, one row per order"""
+    customer = order.get('customer_info') or {}
+    discount_source = order.get('discount_source') or {}
+    yield [
+        str(order['_id']), order.get('order_date'), order.get('status'),
+        customer.get('name'), customer.get('phone'), customer.get('email'), customer.get('address'),
+        order.get('user_id'), len(order.get('items') or []), order.get('subtotal'), order.get('discount'),
+        discount_source.get('code'), order.get('delivery_fee'), order.get('total_amount'),
+        order.get('delivered_date'), order.get('cancellation_reason')
+    ]
+
+def order_item_export_rows(order):
+    """CSV rows (lists) for one order, one row per line item"""
+    customer = order.get('customer_info') or {}
+    for item in order.get('items') or []:
+        price = item.get('price')
+        quantity = item.get('quantity')
+        line_total = price * quantity if isinstance(price, (int, float)) and isinstance(quantity, (int, float)) else None
+        yield [
+            str(order['_id']), order.get('order_date'), order.get('status'),
+            customer.get('name'), customer.get('phone'),
+            item.get('id'), item.get('name'), quantity, price, line_total
+        ]
+
+def iter_orders_csv(cursor, columns, row_builder):
+    """Yield a CSV export chunk by chunk from an orders cursor (constant memory)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk.encode('utf-8')
+    
+    # BOM so spreadsheet apps read ₹ and non-Latin names as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    yield flush()
+    
+    rows = 0
+    try:
+        for order in cursor:
+            for row in row_builder(order):
+                writer.writerow([csv_cell(value) for value in row])
+                rows += 1
+            if buffer.tell() >= 64 * 1024:
+                yield flush()
+    except Exception as e:
+        logger.error(f"❌ Error streaming orders CSV after {rows} rows: {e}")
+    finally:
+        cursor.close()
+    yield flush()
+    logger.info(f"📤 Exported {rows} CSV rows")
+
+def secure_filename_part(text):
+    """Keep a filename fragment to letters, digits, dash and underscore"""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', text)[:60]
+
+# Admin: Export Orders as CSV
+@app.route('/admin/orders/export', methods=['GET'])
 @admin_required
-def get_dashboard_stats():
-    """Get dashboard statistics (admin only)"""
+@limiter.limit("10 per minute")
+def export_orders_csv():
+    """
+    Stream orders as CSV (admin only). ?rows=orders (default) or ?rows=items for one row per
+    line item; filters as /admin/orders: ?from=, ?to=, ?status=, ?phone=.
+    """
     try:
-        # Get today's date range
-        today_start = datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + datetime.timedelta(days=1)
+        if orders_collection is None:
+            return jsonify({"success": False, "message": "Database connection not available."}), 500
         
-        # Count today's orders (all orders placed today)
-        todays_orders = orders_collection.count_documents({
-            "order_date": {"$gte": today_start, "$lt": today_end}
-        })
+        rows = request.args.get('rows', 'orders')
+        if rows not in ('orders', 'items'):
+            return jsonify({"success": False, "message": "rows must be 'orders' or 'items'."}), 400
+        
+        query = build_admin_order_query(request.args)
+        cursors = [orders_collection.find(query, {"status_history": 0}).sort(ORDER_EXPORT_SORT).batch_size(STREAM_BATCH_SIZE)]
+        # Older ranges also read the archive; both cursors are merged in date order
+        watermark = get_archive_watermark()
+        from_date = query.get('order_date', {}).get('$gte')
+        if watermark is not None and (from_date is None or from_date < watermark):
+            cursors.append(orders_archive_collection.find(query, {"status_history": 0}).sort(ORDER_EXPORT_SORT).batch_size(STREAM_BATCH_SIZE))
+        cursor = merge_order_streams(cursors)
+        if rows == 'items':
+            body = iter_orders_csv(cursor, ORDER_ITEM_EXPORT_COLUMNS, order_item_export_rows)
+        else:
+            body = iter_orders_csv(cursor, ORDER_EXPORT_COLUMNS, order_export_rows)
         
-        # Count today's delivered orders
-        todays_delivered = orders_collection.count_documents({
-            "status": "Delivered",
-            "delivered_date": {"$gte": today_start, "$lt": today_end}
-        })
+        period = '-'.join(part for part in (request.args.get('from'), request.args.get('to')) if part) or 'all'
+        response = app.response_class(body, mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename="orders-{rows}-{secure_filename_part(period)}.csv"'
+        return response
         
-        # Calculate today's sales (only count DELIVERED orders from today)
-        today_pipeline = [
-            {"$match": {
-                "status": "Delivered",
-                "delivered_date": {"$gte": today_start, "$lt": today_end}
-            }},
-            {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
-        ]
-        todays_sales_result = list(orders_collection.aggregate(today_pipeline))
-        todays_sales = todays_sales_result[0]['total'] if todays_sales_result else 0
-        
-        # Count pending orders
-        pending_orders = orders_collection.count_documents({"status": "Pending"})
-        
-        # Count total products
-        total_products = products_collection.count_documents({})
-        
-        # Count low stock products (if stock field exists)
-        low_stock_products = products_collection.count_documents({"stock": {"$lt": 10, "$exists": True}})
-        
-        # Count total customers
-        total_customers = users_collection.count_documents({"role": "customer"})
-        
-        # Get recent orders (last 5)
-        recent_orders = list(orders_collection.find({}).sort("order_date", -1).limit(5))
-        for order in recent_orders:
-            order['_id'] = str(order['_id'])
-            if 'order_date' in order and isinstance(order['order_date'], datetime.datetime):
-                order['order_date'] = order['order_date'].isoformat()
-        
-        stats = {
-            "todays_orders": todays_orders,
-            "todays_delivered": todays_delivered,
-            "todays_sales": round(todays_sales, 2),
-            "pending_orders": pending_orders,
-            "total_products": total_products,
-            "low_stock_products": low_stock_products,
-            "total_customers": total_customers,
-            "recent_orders": recent_orders
-        }
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error exporting orders: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# ========== DAILY SALES ROLLUPS ==========
+# One daily_sales document per store-local (IST) day, _id "YYYY-MM-DD":
+#   orders / order_value        orders placed that day (cancelled ones included)
+#   cancelled / cancelled_value orders placed that day that are now Cancelled
+#   delivered / revenue         orders now Delivered whose delivered_date falls on that day
+# Each order records what the rollups count for it in sales_rollup. submit_order and
+# the status routes update that record and queue the difference to rollup_outbox in
+# the order transaction; a background worker folds queued events into daily_sales
+# after commit, so checkouts never contend on today's document. Orders placed before
+# the rollups existed are counted once by the order backfill.
+STORE_TIMEZONE = datetime.timezone(datetime.timedelta(hours=5, minutes=30), "IST")
+SALES_ROLLUP_FIELDS = ('orders', 'order_value', 'cancelled', 'cancelled_value', 'delivered', 'revenue')
+SALES_ROLLUPS_META_ID = "sales_rollups"
+DEFAULT_SALES_REPORT_DAYS = 30
+MAX_SALES_REPORT_DAYS = 366
+ROLLUP_BATCH_SIZE = 200
+ROLLUP_POLL_SECONDS = 5
+
+_rollup_worker_pid = None
+_rollup_worker_lock = threading.Lock()
+_rollup_wakeup = threading.Event()
+
+def store_day(moment):
+    """The store-local day (YYYY-MM-DD) of a naive UTC datetime"""
+    return moment.replace(tzinfo=datetime.timezone.utc).astimezone(STORE_TIMEZONE).strftime('%Y-%m-%d')
+
+def store_day_start(day=None):
+    """Naive UTC datetime of local midnight for a YYYY-MM-DD day (default today)"""
+    day = day or store_day(datetime.datetime.utcnow())
+    local_midnight = datetime.datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=STORE_TIMEZONE)
+    return local_midnight.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+def order_sales_contribution(order):
+    """What the sales rollups count for an order in its current state (stored as order.sales_rollup)"""
+    delivered = order.get('status') == "Delivered" and order.get('delivered_date')
+    return {
+        "placed": store_day(order['order_date']) if order.get('order_date') else None,
+        "cancelled": order.get('status') == "Cancelled",
+        "delivered": store_day(order['delivered_date']) if delivered else None
+    }
+
+def add_sales_rollup_deltas(deltas, order, contribution, sign):
+    """Add (sign=1) or remove (sign=-1) an order's contribution to a {day: {field: delta}} dict"""
+    if not contribution:
+        return deltas
+    total = order.get('total_amount') or 0
+    
+    def add(day, **values):
+        rollup = deltas.setdefault(day, {})
+        for field, value in values.items():
+            rollup[field] = rollup.get(field, 0) + sign * value
+    
+    if contribution.get('placed'):
+        add(contribution['placed'], orders=1, order_value=total)
+        # Cancellations count on the day the order was placed
+        if contribution.get('cancelled'):
+            add(contribution['placed'], cancelled=1, cancelled_value=total)
+    if contribution.get('delivered'):
+        add(contribution['delivered'], delivered=1, revenue=total)
+    return deltas
+
+def merge_sales_rollup_deltas(target, deltas):
+    for day, values in deltas.items():
+        rollup = target.setdefault(day, {})
+        for field, value in values.items():
+            rollup[field] = rollup.get(field, 0) + value
+    return target
+
+def build_rollup_event(daily, products):
+    """Outbox event from daily and product deltas, dropping those that cancel out; None if empty"""
+    daily = {
+        day: {field: value for field, value in values.items() if value}
+        for day, values in daily.items()
+    }
+    daily = {day: values for day, values in daily.items() if values}
+    products = [rollup for rollup in products.values() if rollup['units'] or rollup['revenue']]
+    if not daily and not products:
+        return None
+    return {"daily": daily, "products": products, "created_at": datetime.datetime.utcnow()}
+
+def sales_rollup_event(order, counted, contribution):
+    """Outbox event moving an order's rollups from counted to contribution, or None if nothing changes"""
+    daily = add_sales_rollup_deltas({}, order, contribution, 1)
+    add_sales_rollup_deltas(daily, order, counted, -1)
+    products = add_product_sales_deltas({}, order, contribution, 1)
+    add_product_sales_deltas(products, order, counted, -1)
+    return build_rollup_event(daily, products)
+
+def enqueue_sales_rollups(events, session=None):
+    """Insert rollup events (inside the caller's transaction when session is given)"""
+    events = [event for event in events if event]
+    if events:
+        rollup_outbox_collection.insert_many(events, ordered=False, session=session)
+
+def apply_rollup_batch(session):
+    """Fold the oldest queued rollup events into daily_sales and product_sales; returns how many were applied"""
+    events = list(rollup_outbox_collection.find({}, session=session).sort("_id", ASCENDING).limit(ROLLUP_BATCH_SIZE))
+    if not events:
+        return 0
+    
+    daily, products = {}, {}
+    for event in events:
+        merge_sales_rollup_deltas(daily, event.get('daily') or {})
+        for rollup in event.get('products') or []:
+            merged = products.setdefault(rollup['_id'], dict(rollup, units=0, revenue=0))
+            merged['units'] += rollup['units']
+            merged['revenue'] += rollup['revenue']
+    now = datetime.datetime.utcnow()
+    updates = [
+        UpdateOne({"_id": day}, {"$inc": values, "$set": {"updated_at": now}}, upsert=True)
+        for day, values in daily.items() if values
+    ]
+    if updates:
+        daily_sales_collection.bulk_write(updates, ordered=False, session=session)
+    product_updates = [
+        UpdateOne(
+            {"_id": key},
+            {
+                "$inc": {"units": rollup['units'], "revenue": rollup['revenue']},
+                "$set": {"granularity": rollup['granularity'], "period": rollup['period'],
+                         "product_id": rollup['product_id'], "name": rollup['name'], "updated_at": now}
+            },
+            upsert=True
+        )
+        for key, rollup in products.items()
+    ]
+    if product_updates:
+        product_sales_collection.bulk_write(product_updates, ordered=False, session=session)
+    rollup_outbox_collection.delete_many({"_id": {"$in": [event['_id'] for event in events]}}, session=session)
+    return len(events)
+
+def drain_rollup_outbox():
+    """Apply queued rollup events until the outbox is empty; returns how many were applied"""
+    applied = 0
+    while True:
+        count = run_in_transaction(apply_rollup_batch)
+        applied += count
+        if count < ROLLUP_BATCH_SIZE:
+            return applied
+
+def rollup_worker_loop():
+    """Drain the rollup outbox, then sleep until woken or polled"""
+    while True:
+        try:
+            drain_rollup_outbox()
+            _rollup_wakeup.wait(ROLLUP_POLL_SECONDS)
+            _rollup_wakeup.clear()
+        except Exception as e:
+            logger.error(f"❌ Rollup worker error: {e}")
+            time.sleep(ROLLUP_POLL_SECONDS)
+
+def start_rollup_worker():
+    """Start the rollup worker once per process (gunicorn forks after import with --preload)"""
+    global _rollup_worker_pid, _rollup_wakeup
+    if _rollup_worker_pid == os.getpid() or rollup_outbox_collection is None:
+        return
+    with _rollup_worker_lock:
+        if _rollup_worker_pid == os.getpid():
+            return
+        _rollup_wakeup = threading.Event()
+        threading.Thread(target=rollup_worker_loop, name="rollup-worker", daemon=True).start()
+        _rollup_worker_pid = os.getpid()
+
+def wake_rollup_worker():
+    """Make sure this process has a rollup worker running and nudge it to apply events now"""
+    start_rollup_worker()
+    _rollup_wakeup.set()
+
+start_rollup_worker()
+
+def backfill_sales_rollups(collection, orders, session):
+    """Record and queue the contribution of a batch of orders the rollups have not counted"""
+    daily, products = {}, {}
+    updates = []
+    for order in orders:
+        contribution = order_sales_contribution(order)
+        add_sales_rollup_deltas(daily, order, contribution, 1)
+        add_product_sales_deltas(products, order, contribution, 1)
+        updates.append(UpdateOne({"_id": order['_id']}, {"$set": {"sales_rollup": contribution}}))
+    collection.bulk_write(updates, ordered=False, session=session)
+    enqueue_sales_rollups([build_rollup_event(daily, products)], session=session)
+
+def parse_report_range(args, default_days=DEFAULT_SALES_REPORT_DAYS, max_days=MAX_SALES_REPORT_DAYS):
+    """
+    Read ?from= / ?to= (inclusive YYYY-MM-DD store-local days, default the last
+    default_days days, at most max_days) and return them as datetimes.
+    Raises ValueError on bad input.
+    """
+    try:
+        end = datetime.datetime.strptime(args.get('to') or store_day(datetime.datetime.utcnow()), '%Y-%m-%d')
+        start = datetime.datetime.strptime(args['from'], '%Y-%m-%d') if args.get('from') else end - datetime.timedelta(days=default_days - 1)
+    except ValueError:
+        raise ValueError("Dates must be YYYY-MM-DD.")
+    if start > end:
+        raise ValueError("'from' must not be after 'to'.")
+    if (end - start).days >= max_days:
+        raise ValueError(f"At most {max_days} days can be reported at once.")
+    return start, end
+
+def get_sales_rollups(first_day, last_day):
+    """Rollups for every day in [first_day, last_day], with zeros for days without orders"""
+    stored = {doc['_id']: doc for doc in daily_sales_collection.find({"_id": {"$gte": first_day, "$lte": last_day}})}
+    days = []
+    day = datetime.datetime.strptime(first_day, '%Y-%m-%d').date()
+    end = datetime.datetime.strptime(last_day, '%Y-%m-%d').date()
+    while day <= end:
+        key = day.isoformat()
+        doc = stored.get(key, {})
+        days.append({"date": key, **{field: doc.get(field, 0) for field in SALES_ROLLUP_FIELDS}})
+        day += datetime.timedelta(days=1)
+    return days
+
+# Admin: Daily Sales Report
+@app.route('/admin/reports/daily-sales', methods=['GET'])
+@admin_required
+def get_daily_sales_report():
+    """Get per-day sales from the rollups, ?from=YYYY-MM-DD&to=YYYY-MM-DD (admin only)"""
+    try:
+        start, end = parse_report_range(request.args)
+        
+        days = get_sales_rollups(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        totals = {field: round(sum(day[field] for day in days), 2) for field in SALES_ROLLUP_FIELDS}
+        
+        return jsonify({
+            "success": True,
+            "timezone": "IST",
+            "days": days,
+            "totals": totals,
+            "rollups_ready": order_backfill_done(SALES_ROLLUPS_META_ID)
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error fetching daily sales report: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# ========== SALES ANALYTICS ==========
+# product_sales holds units and revenue per product for each store-local day and
+# month in which its orders were delivered (gross item value, before order-level
+# discounts and delivery fees). _id is "<granularity>:<period>:<product_id>".
+# Both granularities travel in the same rollup_outbox events as daily_sales, so
+# they are applied after commit and backfilled with them; ranges are answered
+# from whole months plus the days at either edge.
+DEFAULT_ANALYTICS_DAYS = 90
+MAX_ANALYTICS_DAYS = 3660  # Ten years of zero-filled days is still a few thousand rows
+DEFAULT_TOP_PRODUCTS = 10
+MAX_TOP_PRODUCTS = 100
+
+def add_product_sales_deltas(deltas, order, contribution, sign):
+    """
+    Add (sign=1) or remove (sign=-1) an order's delivered items to a dict of
+    product_sales changes keyed by rollup _id, for its delivery day and month
+    """
+    day = (contribution or {}).get('delivered')
+    if not day:
+        return deltas
+    for item in order.get('items') or []:
+        product_id = str(item.get('id'))
+        quantity = item.get('quantity') or 0
+        for granularity, period in (('day', day), ('month', day[:7])):
+            key = f"{granularity}:{period}:{product_id}"
+            rollup = deltas.setdefault(key, {
+                "_id": key, "granularity": granularity, "period": period,
+                "product_id": product_id, "name": item.get('name'), "units": 0, "revenue": 0
+            })
+            rollup['units'] += sign * quantity
+            rollup['revenue'] += sign * quantity * (item.get('price') or 0)
+    return deltas
+
+def product_sales_periods(start, end):
+    """
+    Cover [start, end] with the fewest rollup periods: whole months by month,
+    the partial months at either edge by day. Returns a list of filters.
+    """
+    first_full = start.replace(day=1) if start.day == 1 else (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    after_end = end + datetime.timedelta(days=1)
+    last_full_end = after_end.replace(day=1)  # first day after the last whole month
+    
+    if first_full >= last_full_end:
+        return [{"granularity": "day", "period": {"$gte": start.strftime('%Y-%m-%d'), "$lte": end.strftime('%Y-%m-%d')}}]
+    
+    periods = [{"granularity": "month", "period": {
+        "$gte": first_full.strftime('%Y-%m'),
+        "$lte": (last_full_end - datetime.timedelta(days=1)).strftime('%Y-%m')
+    }}]
+    if start < first_full:
+        periods.append({"granularity": "day", "period": {
+            "$gte": start.strftime('%Y-%m-%d'),
+            "$lte": (first_full - datetime.timedelta(days=1)).strftime('%Y-%m-%d')
+        }})
+    if last_full_end <= end:
+        periods.append({"granularity": "day", "period": {
+            "$gte": last_full_end.strftime('%Y-%m-%d'),
+            "$lte": end.strftime('%Y-%m-%d')
+        }})
+    return periods
+
+def get_product_sales(start, end):
+    """Units and revenue per product delivered in [start, end], summed on the server"""
+    return list(product_sales_collection.aggregate([
+        {"$match": {"$or": product_sales_periods(start, end)}},
+        {"$group": {
+            "_id": "$product_id",
+            "name": {"$last": "$name"},
+            "units": {"$sum": "$units"},
+            "revenue": {"$sum": "$revenue"}
+        }},
+        # Deliveries that were later reversed leave zeroed rollups behind
+        {"$match": {"$or": [{"units": {"$ne": 0}}, {"revenue": {"$ne": 0}}]}}
+    ]))
+
+def revenue_series(days):
+    """Roll zero-filled daily rollups up into weekly (Monday-start) and monthly series"""
+    weekly, monthly = {}, {}
+    for day in days:
+        date = datetime.datetime.strptime(day['date'], '%Y-%m-%d').date()
+        week_start = (date - datetime.timedelta(days=date.weekday())).isoformat()
+        for series, key, label in ((weekly, week_start, 'week_start'), (monthly, day['date'][:7], 'month')):
+            bucket = series.setdefault(key, {label: key, **{field: 0 for field in SALES_ROLLUP_FIELDS}})
+            for field in SALES_ROLLUP_FIELDS:
+                bucket[field] += day[field]
+    return list(weekly.values()), list(monthly.values())
+
+def build_sales_analytics(start, end, top):
+    """Revenue series, top products and category breakdown for [start, end]"""
+    days = get_sales_rollups(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+    weekly, monthly = revenue_series(days)
+    
+    products = get_product_sales(start, end)
+    # Categories come from the current catalog, so a recategorised product moves its history with it
+    catalog = get_cached_content('catalog', build_catalog_snapshot)['payload']['products']
+    categories_by_product = {str(product['_id']): product.get('category') or 'Uncategorized' for product in catalog}
+    
+    categories = {}
+    for product in products:
+        product['product_id'] = product.pop('_id')
+        product['revenue'] = round(product['revenue'], 2)
+        product['category'] = categories_by_product.get(product['product_id'], 'Uncategorized')
+        bucket = categories.setdefault(product['category'], {"category": product['category'], "units": 0, "revenue": 0, "products": 0})
+        bucket['units'] += product['units']
+        bucket['revenue'] += product['revenue']
+        bucket['products'] += 1
+    for bucket in categories.values():
+        bucket['revenue'] = round(bucket['revenue'], 2)
+    
+    return {
+        "success": True,
+        "timezone": "IST",
+        "from": start.strftime('%Y-%m-%d'),
+        "to": end.strftime('%Y-%m-%d'),
+        "totals": {field: round(sum(day[field] for day in days), 2) for field in SALES_ROLLUP_FIELDS},
+        "revenue": {"daily": days, "weekly": weekly, "monthly": monthly},
+        "top_products": {
+            "by_units": heapq.nlargest(top, products, key=lambda p: (p['units'], p['revenue'])),
+            "by_revenue": heapq.nlargest(top, products, key=lambda p: (p['revenue'], p['units']))
+        },
+        "categories": sorted(categories.values(), key=lambda c: c['revenue'], reverse=True)
+    }
+
+# Admin: Sales Analytics
+@app.route('/admin/analytics', methods=['GET'])
+@admin_required
+def get_sales_analytics():
+    """Get revenue series, top products and categories for ?from=&to= (admin only)"""
+    try:
+        start, end = parse_report_range(request.args, default_days=DEFAULT_ANALYTICS_DAYS, max_days=MAX_ANALYTICS_DAYS)
+        try:
+            top = int(request.args.get('top', DEFAULT_TOP_PRODUCTS))
+        except ValueError:
+            raise ValueError("top must be a number.")
+        if not 1 <= top <= MAX_TOP_PRODUCTS:
+            raise ValueError(f"top must be between 1 and {MAX_TOP_PRODUCTS}.")
+        
+        return jsonify(build_sales_analytics(start, end, top)), 200
+        
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error fetching sales analytics: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# ========== DASHBOARD STATISTICS ==========
+DASHBOARD_STATS_TTL_SECONDS = 10
+DASHBOARD_RECENT_ORDERS = 5
+LOW_STOCK_THRESHOLD = 10
+
+def _facet_count(result, name):
+    rows = result.get(name) or []
+    return rows[0]['n'] if rows else 0
+
+def build_dashboard_stats():
+    """Compute the admin dashboard numbers from today's rollup and one $facet per collection"""
+    # "Today" is the store's local (IST) day
+    today = store_day(datetime.datetime.utcnow())
+    today_start = store_day_start(today)
+    today_sales = daily_sales_collection.find_one({"_id": today}) or {}
+    
+    # $facet branches cannot use indexes, so narrow the input first with an indexed $or
+    # to just today's orders and pending orders
+    orders_facets = next(orders_collection.aggregate([
+        {"$match": {"$or": [
+            {"order_date": {"$gte": today_start}},
+            {"status": "Pending"}
+        ]}},
+        {"$facet": {
+            "pending_orders": [{"$match": {"status": "Pending"}}, {"$count": "n"}],
+            "recent_orders": [
+                {"$match": {"order_date": {"$gte": today_start}}},
+                {"$sort": {"order_date": -1, "_id": -1}},
+                {"$limit": DASHBOARD_RECENT_ORDERS}
+            ]
+        }}
+    ]), {})
+    
+    recent_orders = orders_facets.get('recent_orders') or []
+    if len(recent_orders) < DASHBOARD_RECENT_ORDERS:
+        # Quiet day: the latest orders reach back before today
+        recent_orders = list(orders_collection.find({}).sort(ORDER_LIST_SORT).limit(DASHBOARD_RECENT_ORDERS))
+    
+    products_facets = next(products_collection.aggregate([
+        {"$facet": {
+            "total_products": [{"$count": "n"}],
+            # Count low stock products (if stock field exists)
+            "low_stock_products": [{"$match": {"stock": {"$lt": LOW_STOCK_THRESHOLD, "$exists": True}}}, {"$count": "n"}]
+        }}
+    ]), {})
+    
+    return {
+        # All orders placed today
+        "todays_orders": today_sales.get('orders', 0),
+        "todays_delivered": today_sales.get('delivered', 0),
+        # Today's sales only count DELIVERED orders
+        "todays_sales": round(today_sales.get('revenue', 0), 2),
+        "pending_orders": _facet_count(orders_facets, 'pending_orders'),
+        "total_products": _facet_count(products_facets, 'total_products'),
+        "low_stock_products": _facet_count(products_facets, 'low_stock_products'),
+        "total_customers": users_collection.count_documents({"role": "customer"}),
+        "recent_orders": recent_orders,
+        "generated_at": datetime.datetime.utcnow()
+    }
+
+# Admin: Get Dashboard Statistics
+@app.route('/admin/dashboard/stats', methods=['GET'])
+@admin_required
+def get_dashboard_stats():
+    """Get dashboard statistics (admin only), shared by all admins for a few seconds"""
+    try:
+        stats = get_ttl_cached('dashboard_stats', build_dashboard_stats, DASHBOARD_STATS_TTL_SECONDS)
         
         return jsonify({"success": True, "stats": stats}), 200
         
@@ -1808,12 +3590,15 @@ def get_dashboard_stats():
 @app.route('/admin/products', methods=['GET'])
 @admin_required
 def get_all_products():
-    """Get all products (admin only)"""
+    """Get all products (admin only), optionally filtered and paginated"""
     try:
-        products = list(products_collection.find({}))
+        if wants_product_page(request.args):
+            try:
+                return jsonify(list_products_page(request.args)), 200
+            except ValueError as e:
+                return jsonify({"success": False, "message": str(e)}), 400
         
-        for product in products:
-            product['_id'] = str(product['_id'])
+        products = list(products_collection.find({}))
         
         return jsonify({"success": True, "products": products}), 200
         
@@ -1848,89 +3633,450 @@ def add_product():
             "cloudinary_public_id": data.get('cloudinary_public_id'),
             "cloudinary_public_ids": data.get('cloudinary_public_ids', [data.get('cloudinary_public_id')] if data.get('cloudinary_public_id') else []),  # Multiple Cloudinary IDs
             "created_at": datetime.datetime.utcnow(),
-            "updated_at": datetime.datetime.utcnow()
+            "updated_at": datetime.datetime.utcnow()
+        }
+        
+        result = products_collection.insert_one(new_product)
+        update_search_index(bump_content_version('catalog'), upserts=[new_product])
+        
+        logger.info(f"✅ Product added: {new_product['name']}")
+        return jsonify({
+            "success": True,
+            "message": "Product added successfully!",
+            "product_id": str(result.inserted_id)
+        }), 201
+        
+    except Exception as e:
+        logger.error(f"❌ Error adding product: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# ========== BULK PRODUCT IMPORT ==========
+BULK_WRITE_CHUNK_SIZE = int(os.environ.get('BULK_WRITE_CHUNK_SIZE', 200))
+DEFAULT_PRODUCT_IMAGE = 'https://placehold.co/300x300/cccccc/666666?text=Product'
+
+def normalize_bulk_product(product, now):
+    """Validate and sanitize one bulk upload row (raises ValueError if invalid)"""
+    if not isinstance(product, dict):
+        raise ValueError("Invalid row format")
+    if not product.get('name') or not product.get('price'):
+        raise ValueError("Missing name or price")
+    
+    return {
+        "name": sanitize_string(product['name']),
+        "price": float(product['price']),
+        "category": sanitize_string(product.get('category') or 'general'),
+        "image": product.get('image_url') or DEFAULT_PRODUCT_IMAGE,
+        "description": sanitize_string(product.get('description', '')),
+        "stock": int(product.get('stock') or 0),
+        "cloudinary_public_id": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def insert_products_in_chunks(products, row_numbers):
+    """
+    Insert normalized products with unordered insert_many calls of BULK_WRITE_CHUNK_SIZE.
+    Returns (inserted_products, failed_rows) where failed_rows holds (row_number, reason).
+    """
+    inserted = []
+    failed_rows = []
+    
+    for start in range(0, len(products), BULK_WRITE_CHUNK_SIZE):
+        chunk = products[start:start + BULK_WRITE_CHUNK_SIZE]
+        chunk_rows = row_numbers[start:start + BULK_WRITE_CHUNK_SIZE]
+        try:
+            products_collection.insert_many(chunk, ordered=False)
+            inserted.extend(chunk)
+        except BulkWriteError as e:
+            # Unordered writes keep going past bad rows; map the errors back to rows
+            errors = {err['index']: err.get('errmsg', 'Write failed') for err in e.details.get('writeErrors', [])}
+            for idx, product in enumerate(chunk):
+                if idx in errors:
+                    failed_rows.append((chunk_rows[idx], errors[idx]))
+                else:
+                    inserted.append(product)
+        except Exception as e:
+            logger.error(f"❌ Bulk insert of rows {chunk_rows[0]}-{chunk_rows[-1]} failed: {e}")
+            failed_rows.extend((row, str(e)) for row in chunk_rows)
+    
+    return inserted, failed_rows
+
+# Admin: Bulk Upload Products
+@app.route('/admin/products/bulk-upload', methods=['POST'])
+@admin_required
+@limiter.limit("5 per minute")
+def bulk_upload_products():
+    """Bulk upload products from Excel/CSV (admin only)"""
+    try:
+        data = request.get_json()
+        
+        if 'products' not in data or not isinstance(data['products'], list):
+            return jsonify({"success": False, "message": "Invalid data format. Expected 'products' array."}), 400
+        
+        products_to_insert = data['products']
+        
+        if len(products_to_insert) == 0:
+            return jsonify({"success": False, "message": "No products to upload."}), 400
+        
+        if len(products_to_insert) > 500:
+            return jsonify({"success": False, "message": "Maximum 500 products can be uploaded at once."}), 400
+        
+        # Validate and normalize the whole batch before touching the database
+        now = datetime.datetime.utcnow()
+        new_products = []
+        row_numbers = []
+        failed_rows = []
+        
+        for idx, product in enumerate(products_to_insert):
+            try:
+                new_products.append(normalize_bulk_product(product, now))
+                row_numbers.append(idx + 1)
+            except (TypeError, ValueError) as e:
+                failed_rows.append((idx + 1, str(e)))
+        
+        inserted, write_failures = insert_products_in_chunks(new_products, row_numbers)
+        failed_rows.extend(write_failures)
+        failed_rows.sort()
+        
+        created_count = len(inserted)
+        failed_count = len(failed_rows)
+        failed_items = [f"Row {row}: {reason}" for row, reason in failed_rows]
+        
+        if created_count > 0:
+            update_search_index(bump_content_version('catalog'), upserts=inserted)
+        
+        logger.info(f"📦 Bulk upload completed: {created_count} created, {failed_count} failed")
+        
+        return jsonify({
+            "success": True,
+            "message": f"Bulk upload completed: {created_count} products created, {failed_count} failed",
+            "created_count": created_count,
+            "failed_count": failed_count,
+            "failed_items": failed_items[:10]  # Return first 10 failed items
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"❌ Error in bulk upload: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# ========== STREAMING CATALOG IMPORT ==========
+# Large supplier catalogs (CSV or NDJSON, optionally gzip-compressed) are spooled
+# to a temp file while the request streams in, then parsed row by row in a
+# background thread that writes chunks through insert_products_in_chunks.
+MAX_IMPORT_BYTES = int(os.environ.get('MAX_IMPORT_BYTES', 200 * 1024 * 1024))
+IMPORT_SPOOL_CHUNK_BYTES = 64 * 1024
+IMPORT_MAX_REPORTED_ERRORS = 50
+# Running jobs hold a lease renewed after every chunk. A job whose lease lapses (its
+# worker died) is resumed after its last recorded row by a worker on the same host,
+# where the spooled file lives, or failed once nobody can resume it.
+IMPORT_LEASE_SECONDS = 120
+IMPORT_RECOVERY_INTERVAL_SECONDS = 60
+IMPORT_ABANDON_SECONDS = 3600
+IMPORT_MAX_ATTEMPTS = 3
+IMPORT_HOST = socket.gethostname()
+IMPORT_ACTIVE_STATUSES = ['queued', 'running']
+
+_import_recovery_pid = None
+IMPORT_FORMATS = {
+    'csv': 'csv',
+    'text/csv': 'csv',
+    'ndjson': 'ndjson',
+    'jsonl': 'ndjson',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson'
+}
+
+def detect_import_format():
+    """Work out the import format from ?format= or the Content-Type header"""
+    requested = request.args.get('format') or request.mimetype
+    return IMPORT_FORMATS.get((requested or '').lower())
+
+def spool_request_body(max_bytes=MAX_IMPORT_BYTES):
+    """Copy the raw request body to a temp file in fixed-size chunks; returns (path, size)"""
+    size = 0
+    spool = tempfile.NamedTemporaryFile(prefix='catalog-import-', delete=False)
+    try:
+        with spool:
+            while True:
+                chunk = request.stream.read(IMPORT_SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"Import file is larger than {max_bytes // (1024 * 1024)} MB.")
+                spool.write(chunk)
+    except Exception:
+        os.remove(spool.name)
+        raise
+    return spool.name, size
+
+def open_import_file(path):
+    """Open a spooled import as text, transparently un-gzipping it"""
+    with open(path, 'rb') as f:
+        is_gzip = f.read(2) == b'\x1f\x8b'
+    raw = gzip.open(path, 'rb') if is_gzip else open(path, 'rb')
+    return io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+
+def iter_import_rows(stream, import_format):
+    """Yield (row_number, row) pairs; row is a dict, or an Exception for unparseable lines"""
+    if import_format == 'csv':
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        # "Image URL" -> "image_url", matching the JSON bulk upload keys
+        keys = [h.strip().lower().replace(' ', '_') for h in header]
+        keys = ['image_url' if k == 'image' and 'image_url' not in keys else k for k in keys]
+        for row_number, values in enumerate(reader, start=1):
+            if any(v.strip() for v in values):
+                yield row_number, dict(zip(keys, values))
+    else:
+        for row_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield row_number, json.loads(line)
+            except ValueError as e:
+                yield row_number, ValueError(f"Invalid JSON: {e}")
+
+class ImportLeaseLost(Exception):
+    """Another worker took over the import job"""
+
+def import_lease_expiry():
+    return datetime.datetime.utcnow() + datetime.timedelta(seconds=IMPORT_LEASE_SECONDS)
+
+def _record_import_progress(job_id, lease_owner, created, failed_rows, processed, last_row):
+    """Add one chunk's results to the import job document and renew its lease"""
+    update = {
+        "$inc": {
+            "rows_processed": processed,
+            "rows_created": created,
+            "rows_failed": len(failed_rows)
+        },
+        "$set": {"last_row": last_row, "lease_until": import_lease_expiry()}
+    }
+    if failed_rows:
+        update["$push"] = {"errors": {
+            "$each": [f"Row {row}: {reason}" for row, reason in failed_rows],
+            "$slice": IMPORT_MAX_REPORTED_ERRORS
+        }}
+    result = import_jobs_collection.update_one({"_id": job_id, "lease_owner": lease_owner}, update)
+    if result.matched_count == 0:
+        raise ImportLeaseLost(f"Lost the lease on import job {job_id}")
+
+def run_product_import_job(job_id, path, import_format, lease_owner, resume_after=0):
+    """
+    Background worker: parse the spooled file and insert products chunk by chunk.
+    Rows up to resume_after were recorded by an earlier attempt and are skipped; a
+    chunk inserted just before a crash can therefore be inserted twice.
+    """
+    created_total = 0
+    import_jobs_collection.update_one(
+        {"_id": job_id, "lease_owner": lease_owner},
+        {"$set": {"status": "running", "started_at": datetime.datetime.utcnow(), "lease_until": import_lease_expiry()}}
+    )
+    
+    try:
+        with open_import_file(path) as stream:
+            now = datetime.datetime.utcnow()
+            products, row_numbers, failed_rows, processed = [], [], [], 0
+            last_row = resume_after
+            
+            for row_number, row in iter_import_rows(stream, import_format):
+                if row_number <= resume_after:
+                    continue
+                processed += 1
+                last_row = row_number
+                try:
+                    if isinstance(row, Exception):
+                        raise row
+                    products.append(normalize_bulk_product(row, now))
+                    row_numbers.append(row_number)
+                except (TypeError, ValueError) as e:
+                    failed_rows.append((row_number, str(e)))
+                
+                if len(products) >= BULK_WRITE_CHUNK_SIZE:
+                    inserted, write_failures = insert_products_in_chunks(products, row_numbers)
+                    created_total += len(inserted)
+                    _record_import_progress(job_id, lease_owner, len(inserted), failed_rows + write_failures, processed, row_number)
+                    products, row_numbers, failed_rows, processed = [], [], [], 0
+            
+            inserted, write_failures = insert_products_in_chunks(products, row_numbers)
+            created_total += len(inserted)
+            _record_import_progress(job_id, lease_owner, len(inserted), failed_rows + write_failures, processed, last_row)
+        
+        import_jobs_collection.update_one(
+            {"_id": job_id, "lease_owner": lease_owner},
+            {"$set": {"status": "completed", "finished_at": datetime.datetime.utcnow()}, "$unset": {"lease_until": ""}}
+        )
+        logger.info(f"📦 Catalog import {job_id} completed: {created_total} products created")
+        
+    except ImportLeaseLost as e:
+        # The new owner carries on from the last recorded row and cleans up the file
+        logger.warning(f"⚠️ {e}")
+        return
+    except Exception as e:
+        logger.error(f"❌ Catalog import {job_id} failed: {e}")
+        import_jobs_collection.update_one(
+            {"_id": job_id, "lease_owner": lease_owner},
+            {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.datetime.utcnow()}, "$unset": {"lease_until": ""}}
+        )
+    finally:
+        if created_total > 0:
+            bump_content_version('catalog')
+    
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def start_import_thread(job_id, path, import_format, lease_owner, resume_after=0):
+    threading.Thread(
+        target=run_product_import_job,
+        args=(job_id, path, import_format, lease_owner, resume_after),
+        name=f"catalog-import-{job_id}",
+        daemon=True
+    ).start()
+
+def recover_stale_import_jobs():
+    """Resume or fail import jobs whose worker stopped renewing the lease"""
+    now = datetime.datetime.utcnow()
+    
+    # Jobs spooled on this host can be picked up where they stopped
+    while True:
+        lease_owner = secrets.token_hex(8)
+        job = import_jobs_collection.find_one_and_update(
+            {"status": {"$in": IMPORT_ACTIVE_STATUSES}, "host": IMPORT_HOST, "lease_until": {"$lt": now}},
+            {"$set": {"lease_owner": lease_owner, "lease_until": import_lease_expiry()}, "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            break
+        
+        if job.get('attempts', 0) <= IMPORT_MAX_ATTEMPTS and job.get('path') and os.path.exists(job['path']):
+            logger.warning(f"🔁 Resuming catalog import {job['_id']} after row {job.get('last_row', 0)}")
+            start_import_thread(job['_id'], job['path'], job['format'], lease_owner, job.get('last_row', 0))
+        else:
+            import_jobs_collection.update_one(
+                {"_id": job['_id'], "lease_owner": lease_owner},
+                {"$set": {
+                    "status": "failed",
+                    "error": "The import was interrupted and could not be resumed. Please upload the file again.",
+                    "finished_at": now
+                }, "$unset": {"lease_until": ""}}
+            )
+            if job.get('path'):
+                try:
+                    os.remove(job['path'])
+                except OSError:
+                    pass
+    
+    # Jobs from hosts that never came back (or from before leases existed)
+    abandoned = import_jobs_collection.update_many(
+        {"status": {"$in": IMPORT_ACTIVE_STATUSES}, "$or": [
+            {"lease_until": {"$lt": now - datetime.timedelta(seconds=IMPORT_ABANDON_SECONDS)}},
+            {"lease_until": {"$exists": False}}
+        ]},
+        {"$set": {
+            "status": "failed",
+            "error": "The import was interrupted and could not be resumed. Please upload the file again.",
+            "finished_at": now
+        }}
+    )
+    if abandoned.modified_count:
+        logger.warning(f"⚠️ Marked {abandoned.modified_count} abandoned catalog imports as failed")
+
+def import_recovery_loop():
+    while True:
+        try:
+            recover_stale_import_jobs()
+        except Exception as e:
+            logger.error(f"❌ Error recovering catalog imports: {e}")
+        time.sleep(IMPORT_RECOVERY_INTERVAL_SECONDS)
+
+def start_import_recovery():
+    """Start the import recovery thread once per process"""
+    global _import_recovery_pid
+    if _import_recovery_pid == os.getpid() or import_jobs_collection is None:
+        return
+    _import_recovery_pid = os.getpid()
+    threading.Thread(target=import_recovery_loop, name="import-recovery", daemon=True).start()
+
+start_import_recovery()
+
+# Admin: Import Products from CSV/NDJSON (Background Job)
+@app.route('/admin/products/import', methods=['POST'])
+@admin_required
+@limiter.limit("5 per minute")
+def import_products():
+    """Stream a CSV or NDJSON catalog (optionally gzip-compressed) into a background import job (admin only)"""
+    try:
+        import_format = detect_import_format()
+        if not import_format:
+            return jsonify({"success": False, "message": "Unsupported format. Use ?format=csv or ?format=ndjson."}), 400
+        
+        try:
+            path, size = spool_request_body()
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 413
+        
+        if size == 0:
+            os.remove(path)
+            return jsonify({"success": False, "message": "No file data provided."}), 400
+        
+        job = {
+            "type": "product_import",
+            "format": import_format,
+            "status": "queued",
+            "size_bytes": size,
+            "rows_processed": 0,
+            "rows_created": 0,
+            "rows_failed": 0,
+            "errors": [],
+            "created_by": request.headers.get('User-ID'),
+            "created_at": datetime.datetime.utcnow(),
+            "host": IMPORT_HOST,
+            "path": path,
+            "last_row": 0,
+            "attempts": 1,
+            "lease_owner": secrets.token_hex(8),
+            "lease_until": import_lease_expiry()
         }
+        job_id = import_jobs_collection.insert_one(job).inserted_id
         
-        result = products_collection.insert_one(new_product)
+        start_import_thread(job_id, path, import_format, job['lease_owner'])
         
-        logger.info(f"✅ Product added: {new_product['name']}")
+        logger.info(f"📥 Catalog import {job_id} queued ({import_format}, {size} bytes)")
         return jsonify({
             "success": True,
-            "message": "Product added successfully!",
-            "product_id": str(result.inserted_id)
-        }), 201
+            "message": "Import started.",
+            "job_id": str(job_id),
+            "status_url": f"/admin/products/import/{job_id}"
+        }), 202
         
     except Exception as e:
-        logger.error(f"❌ Error adding product: {e}")
+        logger.error(f"❌ Error starting catalog import: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
-# Admin: Bulk Upload Products
-@app.route('/admin/products/bulk-upload', methods=['POST'])
+# Admin: Get Import Job Status
+@app.route('/admin/products/import/<job_id>', methods=['GET'])
 @admin_required
-@limiter.limit("5 per minute")
-def bulk_upload_products():
-    """Bulk upload products from Excel/CSV (admin only)"""
+def get_import_job(job_id):
+    """Get progress of a catalog import job (admin only)"""
     try:
-        data = request.get_json()
-        
-        if 'products' not in data or not isinstance(data['products'], list):
-            return jsonify({"success": False, "message": "Invalid data format. Expected 'products' array."}), 400
-        
-        products_to_insert = data['products']
-        
-        if len(products_to_insert) == 0:
-            return jsonify({"success": False, "message": "No products to upload."}), 400
-        
-        if len(products_to_insert) > 500:
-            return jsonify({"success": False, "message": "Maximum 500 products can be uploaded at once."}), 400
-        
-        created_count = 0
-        failed_count = 0
-        failed_items = []
-        
-        for idx, product in enumerate(products_to_insert):
-            try:
-                # Validate required fields
-                if not product.get('name') or not product.get('price'):
-                    failed_count += 1
-                    failed_items.append(f"Row {idx+1}: Missing name or price")
-                    continue
-                
-                # Sanitize and prepare product
-                new_product = {
-                    "name": sanitize_string(product['name']),
-                    "price": float(product['price']),
-                    "category": sanitize_string(product.get('category', 'general')),
-                    "image": product.get('image_url', 'https://placehold.co/300x300/cccccc/666666?text=Product'),
-                    "description": sanitize_string(product.get('description', '')),
-                    "stock": int(product.get('stock', 0)),
-                    "cloudinary_public_id": None,
-                    "created_at": datetime.datetime.utcnow(),
-                    "updated_at": datetime.datetime.utcnow()
-                }
-                
-                # Insert product
-                products_collection.insert_one(new_product)
-                created_count += 1
-                logger.info(f"✅ Bulk upload - Product added: {new_product['name']}")
-                
-            except Exception as e:
-                failed_count += 1
-                failed_items.append(f"Row {idx+1}: {str(e)}")
-                logger.error(f"❌ Bulk upload - Failed to add product at row {idx+1}: {e}")
+        try:
+            job = import_jobs_collection.find_one({"_id": ObjectId(job_id)}, {"path": 0, "lease_owner": 0})
+        except Exception:
+            return jsonify({"success": False, "message": "Invalid job ID."}), 400
         
-        logger.info(f"📦 Bulk upload completed: {created_count} created, {failed_count} failed")
+        if not job:
+            return jsonify({"success": False, "message": "Import job not found."}), 404
         
-        return jsonify({
-            "success": True,
-            "message": f"Bulk upload completed: {created_count} products created, {failed_count} failed",
-            "created_count": created_count,
-            "failed_count": failed_count,
-            "failed_items": failed_items[:10]  # Return first 10 failed items
-        }), 200
+        return jsonify({"success": True, "job": job}), 200
         
     except Exception as e:
-        logger.error(f"❌ Error in bulk upload: {e}")
+        logger.error(f"❌ Error fetching import job {job_id}: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Admin: Update Product
@@ -1965,14 +4111,16 @@ def update_product(product_id):
             update_fields['cloudinary_public_ids'] = data['cloudinary_public_ids']
         
         # Check if product_id is numeric (old format) or ObjectId
-        try:
-            query = {"_id": int(product_id)}
-        except ValueError:
-            query = {"_id": ObjectId(product_id)}
+        query = {"_id": parse_product_id(product_id)}
         
-        result = products_collection.update_one(query, {"$set": update_fields})
+        updated_product = products_collection.find_one_and_update(
+            query,
+            {"$set": update_fields},
+            return_document=ReturnDocument.AFTER
+        )
         
-        if result.matched_count > 0:
+        if updated_product:
+            update_search_index(bump_content_version('catalog'), upserts=[updated_product])
             logger.info(f"✅ Product updated: {product_id}")
             return jsonify({"success": True, "message": "Product updated successfully!"}), 200
         else:
@@ -1990,10 +4138,7 @@ def delete_product(product_id):
     """Delete product (admin only)"""
     try:
         # Get product to check for Cloudinary image
-        try:
-            query = {"_id": int(product_id)}
-        except ValueError:
-            query = {"_id": ObjectId(product_id)}
+        query = {"_id": parse_product_id(product_id)}
         
         product = products_collection.find_one(query)
         
@@ -2008,6 +4153,7 @@ def delete_product(product_id):
         result = products_collection.delete_one(query)
         
         if result.deleted_count > 0:
+            update_search_index(bump_content_version('catalog'), removed_ids=[product['_id']])
             logger.info(f"✅ Product deleted: {product_id}")
             return jsonify({"success": True, "message": "Product deleted successfully!"}), 200
         else:
@@ -2044,6 +4190,14 @@ def upload_product_image():
 
 # ========== OFFERS/PROMOTIONS MANAGEMENT ==========
 
+# Build the active offer list served by GET /offers
+def build_active_offers_snapshot():
+    """Load all active offers"""
+    # Only return active offers
+    offers = list(offers_collection.find({"active": True}))
+    
+    return {"success": True, "offers": offers}
+
 # Get All Offers (Public)
 @app.route('/offers', methods=['GET'])
 def get_offers():
@@ -2052,18 +4206,8 @@ def get_offers():
         if offers_collection is None:
             return jsonify({"success": False, "message": "Database connection not available."}), 500
         
-        # Only return active offers
-        offers = list(offers_collection.find({"active": True}))
-        
-        for offer in offers:
-            offer['_id'] = str(offer['_id'])
-            # Convert dates to ISO format
-            if 'start_date' in offer:
-                offer['start_date'] = offer['start_date'].isoformat() if isinstance(offer['start_date'], datetime.datetime) else offer['start_date']
-            if 'end_date' in offer:
-                offer['end_date'] = offer['end_date'].isoformat() if isinstance(offer['end_date'], datetime.datetime) else offer['end_date']
-        
-        return jsonify({"success": True, "offers": offers}), 200
+        offers = get_cached_content('offers', build_active_offers_snapshot)
+        return cached_content_response(offers)
         
     except Exception as e:
         logger.error(f"❌ Error fetching offers: {e}")
@@ -2080,16 +4224,6 @@ def get_all_offers_admin():
         
         offers = list(offers_collection.find({}))
         
-        for offer in offers:
-            offer['_id'] = str(offer['_id'])
-            # Convert dates to ISO format
-            if 'start_date' in offer:
-                offer['start_date'] = offer['start_date'].isoformat() if isinstance(offer['start_date'], datetime.datetime) else offer['start_date']
-            if 'end_date' in offer:
-                offer['end_date'] = offer['end_date'].isoformat() if isinstance(offer['end_date'], datetime.datetime) else offer['end_date']
-            if 'created_at' in offer:
-                offer['created_at'] = offer['created_at'].isoformat() if isinstance(offer['created_at'], datetime.datetime) else offer['created_at']
-        
         return jsonify({"success": True, "offers": offers}), 200
         
     except Exception as e:
@@ -2152,6 +4286,7 @@ def add_offer():
         }
         
         result = offers_collection.insert_one(new_offer)
+        bump_content_version('offers')
         
         logger.info(f"✅ Offer added: {new_offer['title']}")
         return jsonify({
@@ -2219,6 +4354,7 @@ def update_offer(offer_id):
         result = offers_collection.update_one(query, {"$set": update_fields})
         
         if result.matched_count > 0:
+            bump_content_version('offers')
             logger.info(f"✅ Offer updated: {offer_id}")
             return jsonify({"success": True, "message": "Offer updated successfully!"}), 200
         else:
@@ -2243,6 +4379,7 @@ def delete_offer(offer_id):
         result = offers_collection.delete_one(query)
         
         if result.deleted_count > 0:
+            bump_content_version('offers')
             logger.info(f"✅ Offer deleted: {offer_id}")
             return jsonify({"success": True, "message": "Offer deleted successfully!"}), 200
         else:
@@ -2274,6 +4411,7 @@ def toggle_offer_status(offer_id):
         result = offers_collection.update_one(query, {"$set": {"active": new_status, "updated_at": datetime.datetime.utcnow()}})
         
         if result.matched_count > 0:
+            bump_content_version('offers')
             status_text = "activated" if new_status else "deactivated"
             logger.info(f"✅ Offer {status_text}: {offer_id}")
             return jsonify({"success": True, "message": f"Offer {status_text} successfully!", "active": new_status}), 200
@@ -2337,16 +4475,7 @@ def validate_promo_code():
         discount_type = offer['discount_type']
         discount_value = offer['discount_value']
         max_discount = offer.get('max_discount', None)
-        
-        if discount_type == 'percentage':
-            discount_amount = (cart_total * discount_value) / 100
-            if max_discount and discount_amount > max_discount:
-                discount_amount = max_discount
-        else:  # fixed
-            discount_amount = discount_value
-        
-        # Ensure discount doesn't exceed cart total
-        discount_amount = min(discount_amount, cart_total)
+        discount_amount = calculate_offer_discount(offer, cart_total)
         
         final_total = cart_total - discount_amount
         
@@ -2409,27 +4538,14 @@ def get_applicable_offers():
             
             # Check if cart meets minimum purchase
             if cart_total >= min_purchase:
-                # Calculate discount
-                discount_type = offer['discount_type']
-                discount_value = offer['discount_value']
-                max_discount = offer.get('max_discount', None)
-                
-                if discount_type == 'percentage':
-                    discount_amount = (cart_total * discount_value) / 100
-                    if max_discount and discount_amount > max_discount:
-                        discount_amount = max_discount
-                else:  # fixed
-                    discount_amount = discount_value
-                
-                # Ensure discount doesn't exceed cart total
-                discount_amount = min(discount_amount, cart_total)
+                discount_amount = calculate_offer_discount(offer, cart_total)
                 
                 offer_data = {
                     "_id": str(offer['_id']),
                     "title": offer['title'],
                     "description": offer['description'],
-                    "discount_type": discount_type,
-                    "discount_value": discount_value,
+                    "discount_type": offer['discount_type'],
+                    "discount_value": offer['discount_value'],
                     "discount_amount": round(discount_amount, 2),
                     "min_purchase": min_purchase
                 }
@@ -2452,6 +4568,209 @@ def get_applicable_offers():
         logger.error(f"❌ Error getting applicable offers: {e}")
         return jsonify({"success": False, "message": "An error occurred."}), 500
 
+# ========== STOCK ADJUSTMENTS ==========
+def adjust_stock_for_items(items, direction, session=None):
+    """
+    Apply an order's stock change as one unordered bulk_write: direction -1 deducts,
+    +1 restores. Quantities are summed per product first. Pass session to make the
+    change part of a transaction.
+    Returns (adjusted_product_ids, failures) where failures holds
+    {"product_id", "quantity", "error"} for each product that was not updated.
+    """
+    quantities = {}
+    failures = []
+    for item in items or []:
+        product_id = item.get('id')
+        quantity = item.get('quantity', 0)
+        if not product_id or not isinstance(quantity, (int, float)) or quantity <= 0:
+            continue
+        try:
+            key = parse_product_id(product_id)
+        except ValueError as e:
+            failures.append({"product_id": str(product_id), "quantity": quantity, "error": str(e)})
+            continue
+        quantities[key] = quantities.get(key, 0) + quantity
+    
+    if not quantities:
+        return [], failures
+    
+    product_ids = list(quantities)
+    # Products without a stock field are not stock-tracked and are left that way
+    operations = [
+        UpdateOne({"_id": pid, "stock": {"$exists": True}}, {"$inc": {"stock": direction * quantities[pid]}})
+        for pid in product_ids
+    ]
+    failed_ids = set()
+    try:
+        result = products_collection.bulk_write(operations, ordered=False, session=session)
+        matched = result.matched_count
+    except BulkWriteError as e:
+        matched = e.details.get('nMatched', 0)
+        for err in e.details.get('writeErrors', []):
+            pid = product_ids[err['index']]
+            failed_ids.add(pid)
+            failures.append({"product_id": str(pid), "quantity": quantities[pid], "error": err.get('errmsg', 'Write failed')})
+    
+    # Only look up which products are missing or untracked when something did not match
+    untracked = set()
+    if matched + len(failed_ids) < len(operations):
+        candidates = [pid for pid in product_ids if pid not in failed_ids]
+        found = {doc['_id']: doc for doc in products_collection.find({"_id": {"$in": candidates}}, {"stock": 1}, session=session)}
+        for pid in candidates:
+            if pid not in found:
+                failed_ids.add(pid)
+                failures.append({"product_id": str(pid), "quantity": quantities[pid], "error": "Product not found"})
+            elif 'stock' not in found[pid]:
+                untracked.add(pid)
+    
+    adjusted = [pid for pid in product_ids if pid not in failed_ids and pid not in untracked]
+    verb = "Deducted" if direction < 0 else "Restored"
+    if adjusted:
+        logger.info(f"📦 {verb} stock for {len(adjusted)} products in one bulk write")
+    for failure in failures:
+        logger.error(f"❌ Stock adjustment failed for product {failure['product_id']}: {failure['error']}")
+    return adjusted, failures
+
+# ========== ORDER STATUS TRANSITIONS ==========
+VALID_ORDER_STATUSES = ['Pending', 'Processing', 'Out for Delivery', 'Delivered', 'Cancelled']
+MAX_BULK_STATUS_ORDERS = 200
+
+def validate_status_change(new_status, cancellation_reason):
+    """Return an error message for an invalid status request, or None"""
+    if new_status not in VALID_ORDER_STATUSES:
+        return "Invalid status."
+    if new_status == 'Cancelled' and not cancellation_reason:
+        return "Cancellation reason is required when cancelling an order."
+    return None
+
+def plan_status_transition(order, new_status, cancellation_reason=None, updated_by=None, now=None):
+    """
+    Work out everything a status change implies for one order: the guarded order
+    update, the stock direction (-1 deducts when an order becomes Delivered, +1
+    restores when a delivered order is cancelled) and the notifications to queue.
+    Stock moves that change a reservation's status are flagged reserved_stock and
+    must be applied in the same transaction as the order update.
+    """
+    now = now or datetime.datetime.utcnow()
+    previous_status = order.get('status')
+    reservation = order.get('stock_reservation') or {}
+    reservation_held = reservation.get('status') == 'held'
+    update_data = {
+        "status": new_status,
+        "updated_at": now
+    }
+    stock_direction = 0
+    stock_items = order.get('items') or []
+    
+    # Delivered orders carry delivered_date for sales tracking and take their items out of
+    # stock, unless checkout already reserved it. Orders placed with a reservation only
+    # ever move the reserved (stock-tracked) items.
+    if new_status == "Delivered":
+        update_data["delivered_date"] = now
+        if reservation_held:
+            update_data["stock_reservation.status"] = "consumed"
+        elif reservation:
+            # An expired or released reservation is taken again on delivery; a consumed one
+            # (delivered before) already has its stock
+            if reservation.get('status') in ('expired', 'released'):
+                update_data["stock_reservation.status"] = "consumed"
+                stock_direction = -1
+                stock_items = reservation.get('items') or []
+        elif previous_status != "Delivered":
+            stock_direction = -1
+    
+    # Cancelled orders keep the reason; stock comes back if it was deducted or still reserved
+    if new_status == "Cancelled":
+        if cancellation_reason:
+            update_data["cancellation_reason"] = cancellation_reason
+        if reservation:
+            if reservation.get('status') in ('held', 'consumed'):
+                update_data["stock_reservation.status"] = "released"
+                stock_direction = 1
+                stock_items = reservation.get('items') or []
+        elif previous_status == "Delivered":
+            stock_direction = 1
+    
+    if "stock_reservation.status" in update_data:
+        update_data["stock_reservation.updated_at"] = now
+    
+    status_history_entry = {
+        "status": new_status,
+        "timestamp": now,
+        "updated_by": updated_by
+    }
+    
+    customer_info = order.get('customer_info') or {}
+    order_data = {
+        "order_id": str(order['_id']),
+        "customer_name": customer_info.get('name', 'Customer'),
+        "total_amount": order.get('total_amount', 0)
+    }
+    payload = {"order_data": order_data, "new_status": new_status, "cancellation_reason": cancellation_reason}
+    notifications = []
+    if customer_info.get('email'):
+        notifications.append(build_notification('order_status_email', customer_info['email'], payload, order_data['order_id']))
+    if customer_info.get('phone'):
+        notifications.append(build_notification('order_status_whatsapp', customer_info['phone'], payload, order_data['order_id']))
+    
+    # Guarded on the status (and reservation state) we planned from, so a concurrent
+    # change or reservation expiry is not overwritten
+    guard = {"_id": order['_id'], "status": previous_status}
+    if reservation:
+        guard["stock_reservation.status"] = reservation.get('status')
+    
+    # Record what the sales rollups will count for the order after this change and queue
+    # the difference; guarding on the old record keeps the backfill from counting it too
+    counted = order.get('sales_rollup')
+    contribution = order_sales_contribution(dict(
+        order,
+        status=new_status,
+        delivered_date=update_data.get('delivered_date', order.get('delivered_date'))
+    ))
+    update_data["sales_rollup"] = contribution
+    guard["sales_rollup"] = counted
+    
+    return {
+        "order_id": order['_id'],
+        "filter": guard,
+        "update": {"$set": update_data, "$push": {"status_history": status_history_entry}},
+        "stock_direction": stock_direction,
+        "items": stock_items,
+        "reserved_stock": bool(reservation),
+        "notifications": notifications,
+        "sales_rollup_event": sales_rollup_event(order, counted, contribution)
+    }
+
+def apply_stock_plans(plans, session=None):
+    """
+    Apply the stock side of applied transitions, one bulk write per direction.
+    Returns (stock_changed, stock_errors); stock is shown on the storefront, so the
+    caller refreshes the catalog snapshot once the change is committed.
+    """
+    stock_errors = []
+    stock_changed = False
+    for direction in (-1, 1):
+        items = [item for plan in plans if plan['stock_direction'] == direction for item in plan['items']]
+        if items:
+            adjusted, errors = adjust_stock_for_items(items, direction, session=session)
+            stock_changed = stock_changed or bool(adjusted)
+            stock_errors.extend(errors)
+    return stock_changed, stock_errors
+
+def apply_reserved_stock(plans, session):
+    """Move reserved stock in the transaction that changes the reservation, so a crash cannot leak it"""
+    return apply_stock_plans([plan for plan in plans if plan['reserved_stock']], session=session)
+
+def finish_stock_plans(plans, reserved_stock):
+    """
+    After commit, apply the stock of orders placed before reservations and refresh
+    the catalog if anything moved. Returns the stock errors of both steps.
+    """
+    stock_changed, stock_errors = apply_stock_plans([plan for plan in plans if not plan['reserved_stock']])
+    if stock_changed or reserved_stock[0]:
+        bump_content_version('catalog')
+    return reserved_stock[1] + stock_errors
+
 # Admin: Update Order Status
 @app.route('/admin/orders/update-status', methods=['PUT'])
 @admin_required
@@ -2468,14 +4787,10 @@ def update_order_status():
         new_status = data['status']
         cancellation_reason = data.get('cancellation_reason', None)  # Optional cancellation reason
         
-        # Validate status
-        valid_statuses = ['Pending', 'Processing', 'Out for Delivery', 'Delivered', 'Cancelled']
-        if new_status not in valid_statuses:
-            return jsonify({"success": False, "message": "Invalid status."}), 400
-        
-        # Validate cancellation reason if status is Cancelled
-        if new_status == 'Cancelled' and not cancellation_reason:
-            return jsonify({"success": False, "message": "Cancellation reason is required when cancelling an order."}), 400
+        # Validate status (and cancellation reason if status is Cancelled)
+        error = validate_status_change(new_status, cancellation_reason)
+        if error:
+            return jsonify({"success": False, "message": error}), 400
         
         # Get order
         order = orders_collection.find_one({"_id": ObjectId(order_id)})
@@ -2483,181 +4798,659 @@ def update_order_status():
         if not order:
             return jsonify({"success": False, "message": "Order not found."}), 404
         
-        # Update order status
-        update_data = {
-            "status": new_status,
-            "updated_at": datetime.datetime.utcnow()
-        }
+        plan = plan_status_transition(order, new_status, cancellation_reason, request.headers.get('User-ID'))
         
-        # If status is Delivered, add delivered_date for sales tracking AND deduct stock
-        if new_status == "Delivered":
-            update_data["delivered_date"] = datetime.datetime.utcnow()
-            
-            # Deduct stock for each item in the order
-            if 'items' in order:
-                for item in order['items']:
-                    product_id = item.get('id')
-                    quantity = item.get('quantity', 0)
-                    
-                    if product_id and quantity > 0:
-                        try:
-                            # Convert string ID to ObjectId
-                            prod_obj_id = ObjectId(product_id)
-                            
-                            # Deduct stock from product
-                            products_collection.update_one(
-                                {"_id": prod_obj_id},
-                                {"$inc": {"stock": -quantity}}  # Decrement stock
-                            )
-                            logger.info(f"📦 Deducted {quantity} units from product {product_id}")
-                        except Exception as e:
-                            logger.error(f"❌ Error deducting stock for product {product_id}: {e}")
-        
-        # If status is Cancelled, add cancellation reason and restore stock
-        if new_status == "Cancelled":
-            if cancellation_reason:
-                update_data["cancellation_reason"] = cancellation_reason
-            
-            # Restore stock if order was already marked as delivered
-            if order.get('status') == 'Delivered' and 'items' in order:
-                for item in order['items']:
-                    product_id = item.get('id')
-                    quantity = item.get('quantity', 0)
-                    
-                    if product_id and quantity > 0:
-                        try:
-                            # Convert string ID to ObjectId
-                            prod_obj_id = ObjectId(product_id)
-                            
-                            # Restore stock to product
-                            products_collection.update_one(
-                                {"_id": prod_obj_id},
-                                {"$inc": {"stock": quantity}}  # Increment stock back
-                            )
-                            logger.info(f"♻️ Restored {quantity} units to product {product_id}")
-                        except Exception as e:
-                            logger.error(f"❌ Error restoring stock for product {product_id}: {e}")
-        
-        # Add status history
-        status_history_entry = {
-            "status": new_status,
-            "timestamp": datetime.datetime.utcnow(),
-            "updated_by": request.headers.get('User-ID')
-        }
+        # The status change, reserved stock, its sales rollup event and notifications are committed together
+        def apply_status(session):
+            result = orders_collection.update_one(plan['filter'], plan['update'], session=session)
+            reserved_stock = (False, [])
+            if result.modified_count > 0:
+                reserved_stock = apply_reserved_stock([plan], session)
+                enqueue_sales_rollups([plan['sales_rollup_event']], session=session)
+                enqueue_notifications(plan['notifications'], session=session)
+            return result, reserved_stock
         
-        result = orders_collection.update_one(
-            {"_id": ObjectId(order_id)},
-            {
-                "$set": update_data,
-                "$push": {"status_history": status_history_entry}
-            }
-        )
+        result, reserved_stock = run_in_transaction(apply_status)
         
         if result.modified_count > 0:
-            order_data = {
-                "order_id": str(order['_id']),
-                "customer_name": order['customer_info'].get('name', 'Customer'),
-                "total_amount": order.get('total_amount', 0)
-            }
-            
-            # Send email notification if customer has email
-            if order.get('customer_info', {}).get('email'):
-                send_order_status_update_email(
-                    order_data,
-                    order['customer_info']['email'],
-                    new_status,
-                    cancellation_reason
-                )
-            
-            # Send WhatsApp notification if customer has phone
-            if order.get('customer_info', {}).get('phone'):
-                send_order_status_update_whatsapp(
-                    order_data,
-                    order['customer_info']['phone'],
-                    new_status,
-                    cancellation_reason
-                )
+            stock_errors = finish_stock_plans([plan], reserved_stock)
+            if plan['sales_rollup_event']:
+                wake_rollup_worker()
+            if plan['notifications']:
+                wake_notification_workers()
             
             logger.info(f"✅ Order status updated: {order_id} -> {new_status}")
-            return jsonify({"success": True, "message": "Order status updated successfully!"}), 200
+            response = {"success": True, "message": "Order status updated successfully!"}
+            if stock_errors:
+                response["stock_errors"] = stock_errors
+            return jsonify(response), 200
         else:
-            return jsonify({"success": False, "message": "Failed to update order status."}), 500
+            return jsonify({"success": False, "message": "Order was changed by another request. Please refresh and try again."}), 409
         
     except Exception as e:
         logger.error(f"❌ Error updating order status: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+# Admin: Bulk Update Order Status
+@app.route('/admin/orders/bulk-update-status', methods=['PUT'])
+@admin_required
+@limiter.limit("10 per minute")
+def bulk_update_order_status():
+    """Move many orders to one status with a single bulk write (admin only)"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('order_ids'), list) or 'status' not in data:
+            return jsonify({"success": False, "message": "Missing order_ids or status."}), 400
+        
+        new_status = data['status']
+        cancellation_reason = data.get('cancellation_reason', None)
+        error = validate_status_change(new_status, cancellation_reason)
+        if error:
+            return jsonify({"success": False, "message": error}), 400
+        
+        order_ids = list(dict.fromkeys(str(order_id) for order_id in data['order_ids']))
+        if not order_ids:
+            return jsonify({"success": False, "message": "No orders selected."}), 400
+        if len(order_ids) > MAX_BULK_STATUS_ORDERS:
+            return jsonify({"success": False, "message": f"At most {MAX_BULK_STATUS_ORDERS} orders can be updated at once."}), 400
+        
+        # Results are keyed by ObjectId and reported under the caller's own id strings,
+        # which may differ in case from str(ObjectId)
+        results = {}
+        requested_ids = {order_id: ObjectId(order_id) if ObjectId.is_valid(order_id) else None for order_id in order_ids}
+        object_ids = list(dict.fromkeys(oid for oid in requested_ids.values() if oid is not None))
+        
+        now = datetime.datetime.utcnow()
+        updated_by = request.headers.get('User-ID')
+        plans = []
+        for order in orders_collection.find({"_id": {"$in": object_ids}}):
+            if order.get('status') == new_status:
+                results[order['_id']] = {"success": True, "message": f"Already {new_status}.", "changed": False}
+            else:
+                plans.append(plan_status_transition(order, new_status, cancellation_reason, updated_by, now))
+        prerender_status_emails([message for plan in plans for message in plan['notifications']], new_status, cancellation_reason)
+        
+        # All order updates, their reserved stock, sales rollup events and notifications are
+        # committed together
+        def apply_statuses(session):
+            if not plans:
+                return [], (False, [])
+            result = orders_collection.bulk_write(
+                [UpdateOne(plan['filter'], plan['update']) for plan in plans],
+                ordered=False,
+                session=session
+            )
+            applied = plans
+            if result.modified_count < len(plans):
+                # Some guards failed (status changed concurrently); find which updates landed
+                landed = {doc['_id'] for doc in orders_collection.find(
+                    {"_id": {"$in": [plan['order_id'] for plan in plans]}, "status": new_status, "updated_at": now},
+                    {"_id": 1},
+                    session=session
+                )}
+                applied = [plan for plan in plans if plan['order_id'] in landed]
+            reserved_stock = apply_reserved_stock(applied, session)
+            enqueue_sales_rollups([plan['sales_rollup_event'] for plan in applied], session=session)
+            enqueue_notifications([n for plan in applied for n in plan['notifications']], session=session)
+            return applied, reserved_stock
+        
+        applied, reserved_stock = run_in_transaction(apply_statuses)
+        applied_ids = {plan['order_id'] for plan in applied}
+        for plan in plans:
+            if plan['order_id'] in applied_ids:
+                results[plan['order_id']] = {"success": True, "message": f"Updated to {new_status}.", "changed": True}
+            else:
+                results[plan['order_id']] = {"success": False, "message": "Order was changed by another request."}
+        
+        stock_errors = finish_stock_plans(applied, reserved_stock)
+        if any(plan['sales_rollup_event'] for plan in applied):
+            wake_rollup_worker()
+        if any(plan['notifications'] for plan in applied):
+            wake_notification_workers()
+        
+        response_results = []
+        for order_id, object_id in requested_ids.items():
+            if object_id is None:
+                result = {"success": False, "message": "Invalid order ID."}
+            else:
+                result = results.get(object_id, {"success": False, "message": "Order not found."})
+            response_results.append(dict(result, order_id=order_id))
+        
+        logger.info(f"✅ Bulk status update -> {new_status}: {len(applied)} of {len(order_ids)} orders updated")
+        response = {
+            "success": True,
+            "message": f"{len(applied)} orders updated to {new_status}.",
+            "updated": len(applied),
+            "results": response_results
+        }
+        if stock_errors:
+            response["stock_errors"] = stock_errors
+        return jsonify(response), 200
+        
+    except Exception as e:
+        logger.error(f"❌ Error bulk updating order status: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# Admin: Notification Delivery Status
+@app.route('/admin/notifications', methods=['GET'])
+@admin_required
+def get_notifications():
+    """List outbox messages, newest first, filtered by ?order_id= and/or ?status= (admin only)"""
+    try:
+        if notification_outbox_collection is None:
+            return jsonify({"success": False, "message": "Database connection not available."}), 500
+        
+        query = {}
+        if request.args.get('order_id'):
+            query['order_id'] = request.args['order_id']
+        if request.args.get('status'):
+            if request.args['status'] not in NOTIFICATION_STATUSES:
+                return jsonify({"success": False, "message": "Invalid status."}), 400
+            query['status'] = request.args['status']
+        limit = parse_page_limit(request.args)
+        
+        notifications = list(notification_outbox_collection.find(query, {"payload": 0}).sort("created_at", -1).limit(limit))
+        
+        return jsonify({"success": True, "notifications": notifications}), 200
+        
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error fetching notifications: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# ========== CUSTOMER ORDER COUNTERS ==========
+# Each customer's users document carries order_count, total_spent and last_order_date
+# over all of their orders, cancelled ones included. submit_order bumps them in the
+# checkout transaction and marks the order customer_counted; orders placed before
+# the counters existed are folded in once by the order backfill below.
+CUSTOMER_COUNTERS_META_ID = "customer_counters"
+CUSTOMER_STATS_PARAMS = ('limit', 'cursor')
+CUSTOMER_STATS_SORT = [("total_spent", DESCENDING), ("_id", DESCENDING)]
+EMPTY_CUSTOMER_COUNTERS = {"order_count": 0, "total_spent": 0, "last_order_date": None}
+
+def customer_counter_update(order):
+    """UpdateOne adding the order to its customer's counters, or None for guest orders"""
+    user_id = order.get('user_id')
+    if not user_id or not ObjectId.is_valid(str(user_id)):
+        return None
+    update = {"$inc": {"order_count": 1, "total_spent": order.get('total_amount') or 0}}
+    if order.get('order_date'):
+        update["$max"] = {"last_order_date": order['order_date']}
+    return UpdateOne({"_id": ObjectId(str(user_id))}, update)
+
+def apply_customer_counter_updates(updates, session=None):
+    """Apply customer counter updates in one bulk write, skipping guest orders"""
+    updates = [update for update in updates if update is not None]
+    if updates:
+        users_collection.bulk_write(updates, ordered=False, session=session)
+
+def prepare_customer_counters():
+    """Give every customer the counter fields, so stats can sort and page on them"""
+    users_collection.update_many(
+        {"role": "customer", "total_spent": {"$exists": False}},
+        {"$set": {"order_count": 0, "total_spent": 0}}
+    )
+
+def backfill_customer_counters(collection, orders, session):
+    """Add a batch of not-yet-counted orders to their customers' counters"""
+    apply_customer_counter_updates([customer_counter_update(order) for order in orders], session=session)
+    collection.update_many(
+        {"_id": {"$in": [order['_id'] for order in orders]}},
+        {"$set": {"customer_counted": True}},
+        session=session
+    )
+
+def aggregate_customer_stats():
+    """Customers with counters computed from the orders themselves (used until the backfill finishes)"""
+    users = list(users_collection.find({"role": "customer"}, {"password": 0}))
+    
+    # Order counts and totals per user, including archived orders
+    totals = {}
+    collections = [orders_collection]
+    if get_archive_watermark() is not None:
+        collections.append(orders_archive_collection)
+    for collection in collections:
+        for row in collection.aggregate([
+            {"$match": {"user_id": {"$ne": None}}},
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}, "total": {"$sum": "$total_amount"}, "last": {"$max": "$order_date"}}}
+        ]):
+            count, total, last = totals.get(row['_id'], (0, 0, None))
+            if row['last'] and (last is None or row['last'] > last):
+                last = row['last']
+            totals[row['_id']] = (count + row['count'], total + row['total'], last)
+    
+    for user in users:
+        user['order_count'], user['total_spent'], user['last_order_date'] = totals.get(str(user['_id']), (0, 0, None))
+    
+    # Sort by total spent
+    users.sort(key=lambda x: x.get('total_spent', 0), reverse=True)
+    return users
+
+def list_customer_stats(args):
+    """
+    Customers sorted by total_spent (highest first) straight off the
+    (role, total_spent, _id) index. With ?limit=/?cursor= returns one page.
+    Until the counter backfill has finished, returns the full list computed
+    from the orders instead. Raises ValueError on bad input.
+    """
+    if not order_backfill_done(CUSTOMER_COUNTERS_META_ID):
+        return {"success": True, "customers": aggregate_customer_stats(), "counters_ready": False}
+    
+    query = {"role": "customer"}
+    paged = any(param in args for param in CUSTOMER_STATS_PARAMS)
+    if args.get('cursor'):
+        last_total, last_id = decode_cursor_pair(args['cursor'])
+        # Customers without counters (registered mid-backfill) sort last, as null
+        if last_total is None:
+            query.update({"total_spent": None, "_id": {"$lt": last_id}})
+        else:
+            query["$or"] = [
+                {"total_spent": {"$lt": last_total}},
+                {"total_spent": last_total, "_id": {"$lt": last_id}},
+                {"total_spent": None}
+            ]
+    
+    cursor = users_collection.find(query, {"password": 0}).sort(CUSTOMER_STATS_SORT)
+    if paged:
+        limit = parse_page_limit(args)
+        cursor = cursor.limit(limit + 1)
+    customers = list(cursor)
+    
+    response = {"success": True, "customers": customers, "counters_ready": True}
+    if paged:
+        has_more = len(customers) > limit
+        customers = customers[:limit]
+        next_cursor = encode_cursor([customers[-1].get('total_spent'), customers[-1]['_id']]) if has_more else None
+        response.update({
+            "customers": customers,
+            "count": len(customers),
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        })
+    for customer in customers:
+        for field, value in EMPTY_CUSTOMER_COUNTERS.items():
+            customer.setdefault(field, value)
+    return response
+
 # Admin: Get Customer Statistics
 @app.route('/admin/customers/stats', methods=['GET'])
 @admin_required
 def get_customer_stats():
-    """Get customer statistics with order counts and total spent (admin only)"""
+    """Get customers with their order counts and total spent (admin only), optionally paginated"""
     try:
-        # Aggregate customers with their order statistics
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "orders",
-                    "localField": "_id",
-                    "foreignField": "user_id",
-                    "as": "orders"
-                }
-            },
-            {
-                "$project": {
-                    "_id": 1,
-                    "name": 1,
-                    "email": 1,
-                    "phone": 1,
-                    "created_at": 1,
-                    "order_count": {"$size": "$orders"},
-                    "total_spent": {"$sum": "$orders.total_amount"}
-                }
-            },
-            {"$sort": {"total_spent": -1}}
-        ]
+        return jsonify(list_customer_stats(request.args)), 200
         
-        # Note: This pipeline assumes user_id in orders is string format
-        # We'll need to handle the conversion differently
-        
-        # Alternative approach: Get all users and calculate stats separately
-        users = list(users_collection.find({"role": "customer"}, {"password": 0}))
-        
-        for user in users:
-            user_id = str(user['_id'])
-            user['_id'] = user_id
-            
-            # Count orders
-            user['order_count'] = orders_collection.count_documents({"user_id": user_id})
-            
-            # Calculate total spent
-            orders = list(orders_collection.find({"user_id": user_id}))
-            user['total_spent'] = sum(order.get('total_amount', 0) for order in orders)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error fetching customer stats: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+# ========== ORDER BACKFILLS ==========
+# Aggregates maintained at write time (customer counters, sales rollups) mark each
+# order they have counted. A background thread folds in every order that predates
+# them, walking orders and orders_archive by _id in transactional batches that count
+# and mark together, so live writes and the backfill never count an order twice.
+# Each entry: meta_id -> (prepare, filter for uncounted orders, apply_batch).
+ORDER_BACKFILL_LOCK_ID = "order_backfill_lock"
+ORDER_BACKFILL_LOCK_SECONDS = 1800
+ORDER_BACKFILL_BATCH_SIZE = 500
+ORDER_BACKFILL_RETRY_SECONDS = 60
+ORDER_BACKFILLS = {
+    CUSTOMER_COUNTERS_META_ID: (prepare_customer_counters, {"customer_counted": {"$ne": True}}, backfill_customer_counters),
+    SALES_ROLLUPS_META_ID: (None, {"sales_rollup": {"$exists": False}}, backfill_sales_rollups)
+}
+
+_order_backfill_pid = None
+
+def order_backfill_done(meta_id):
+    return bool((meta_collection.find_one({"_id": meta_id}, {"backfilled_at": 1}) or {}).get('backfilled_at'))
+
+def backfill_orders(uncounted, apply_batch):
+    """Run apply_batch(collection, orders, session) over every uncounted order; returns the count"""
+    counted = 0
+    for collection in (orders_collection, orders_archive_collection):
+        last_id = None
+        while True:
+            def count_batch(session):
+                query = dict(uncounted)
+                if last_id is not None:
+                    query["_id"] = {"$gt": last_id}
+                orders = list(collection.find(query, session=session).sort("_id", ASCENDING).limit(ORDER_BACKFILL_BATCH_SIZE))
+                if orders:
+                    apply_batch(collection, orders, session)
+                return orders[-1]['_id'] if orders else None, len(orders)
             
-            # Format created_at
-            if 'created_at' in user and isinstance(user['created_at'], datetime.datetime):
-                user['created_at'] = user['created_at'].isoformat()
+            last_id, batch_count = run_in_transaction(count_batch)
+            counted += batch_count
+            if last_id is None:
+                break
+    return counted
+
+def run_order_backfills():
+    """Run every backfill that has not finished yet; True once all have"""
+    pending = [meta_id for meta_id in ORDER_BACKFILLS if not order_backfill_done(meta_id)]
+    if not pending:
+        return True
+    if not acquire_meta_lock(ORDER_BACKFILL_LOCK_ID, ORDER_BACKFILL_LOCK_SECONDS):
+        return False
+    try:
+        for meta_id in pending:
+            prepare, uncounted, apply_batch = ORDER_BACKFILLS[meta_id]
+            started_at = datetime.datetime.utcnow()
+            if prepare:
+                prepare()
+            counted = backfill_orders(uncounted, apply_batch)
+            meta_collection.update_one(
+                {"_id": meta_id},
+                {"$set": {"backfilled_at": started_at, "orders": counted}},
+                upsert=True
+            )
+            logger.info(f"🔢 Backfilled {meta_id} from {counted} orders")
+        return True
+    finally:
+        release_meta_lock(ORDER_BACKFILL_LOCK_ID)
+
+def order_backfill_loop():
+    while True:
+        try:
+            if run_order_backfills():
+                return
+        except Exception as e:
+            logger.error(f"❌ Order backfill failed: {e}")
+        time.sleep(ORDER_BACKFILL_RETRY_SECONDS)
+
+def start_order_backfills():
+    """Start the backfill thread once per process; it exits when every backfill is done"""
+    global _order_backfill_pid
+    if _order_backfill_pid == os.getpid() or meta_collection is None:
+        return
+    _order_backfill_pid = os.getpid()
+    threading.Thread(target=order_backfill_loop, name="order-backfill", daemon=True).start()
+
+start_order_backfills()
+
+# Build the catalog snapshot served by GET /products
+def build_catalog_snapshot():
+    """Load and serialize the full product catalog"""
+    products = list(products_collection.find({}))
+    
+    return {"success": True, "products": products}
+
+# Product listing: filters, projection and keyset pagination
+PRODUCT_LIST_FIELDS = ['name', 'price', 'category', 'image', 'images', 'description', 'stock',
+                       'cloudinary_public_id', 'cloudinary_public_ids', 'created_at', 'updated_at']
+PRODUCT_LIST_PARAMS = ('limit', 'cursor', 'category', 'min_price', 'max_price', 'in_stock', 'fields')
+
+def wants_product_page(args):
+    """Check whether the request asks for a paginated/filtered product listing"""
+    return any(param in args for param in PRODUCT_LIST_PARAMS)
+
+def list_products_page(args):
+    """
+    Return one page of products sorted by _id.
+    Supports ?category=, ?min_price=, ?max_price=, ?in_stock=1, ?fields=name,price
+    and ?limit= / ?cursor= keyset pagination. Raises ValueError on bad input.
+    """
+    conditions = []
+    
+    if args.get('category'):
+        conditions.append({"category": args['category']})
+    
+    price_range = {}
+    try:
+        if args.get('min_price'):
+            price_range['$gte'] = float(args['min_price'])
+        if args.get('max_price'):
+            price_range['$lte'] = float(args['max_price'])
+    except ValueError:
+        raise ValueError("min_price and max_price must be numbers.")
+    if price_range:
+        conditions.append({"price": price_range})
+    
+    if args.get('in_stock', '').lower() in ('1', 'true', 'yes'):
+        conditions.append({"stock": {"$gt": 0}})
+    
+    projection = None
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in PRODUCT_LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        projection = {field: 1 for field in fields}
+    
+    if args.get('cursor'):
+        last_id = decode_cursor(args['cursor'])
+        if isinstance(last_id, ObjectId):
+            conditions.append({"_id": {"$gt": last_id}})
+        else:
+            # Legacy numeric IDs sort before ObjectIds, so include every ObjectId too
+            conditions.append({"$or": [{"_id": {"$gt": last_id}}, {"_id": {"$type": "objectId"}}]})
+    
+    limit = parse_page_limit(args)
+    query = {"$and": conditions} if conditions else {}
+    products = list(products_collection.find(query, projection).sort("_id", ASCENDING).limit(limit + 1))
+    
+    has_more = len(products) > limit
+    products = products[:limit]
+    next_cursor = encode_cursor(products[-1]['_id']) if has_more else None
+    
+    return {
+        "success": True,
+        "products": products,
+        "count": len(products),
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }
+
+# ========== PRODUCT SEARCH INDEX ==========
+# In-process inverted index over name, category and description. It follows the
+# catalog version: admin product routes patch it incrementally, any other catalog
+# change triggers a full rebuild on the next search.
+SEARCH_FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "description": 1.0}
+SEARCH_PREFIX_QUALITY = 0.7  # Score multiplier for prefix matches ("maggi" for "mag")
+SEARCH_TYPO_QUALITY = 0.5  # Score multiplier for one-edit matches ("aata" for "atta")
+SEARCH_MIN_TYPO_LENGTH = 3  # Shorter tokens are too ambiguous for typo matching
+SEARCH_MAX_PREFIX_TERMS = 50
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+def tokenize_search_text(text):
+    """Split text into lowercase search tokens"""
+    return re.findall(r'\w+', str(text or '').lower())
+
+def _single_deletions(term):
+    """All strings obtained by deleting one character from term"""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+def _within_one_edit(a, b):
+    """Check whether a and b differ by at most one insert, delete, substitution or adjacent swap"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    if a[i + 1:] == b[i + 1:]:
+        return True
+    return i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+
+def _new_search_index(version):
+    return {
+        "version": version,
+        "postings": {},  # term -> {product_id: weight}
+        "deletes": {},  # one-char deletion -> set of terms, for typo lookups
+        "terms": [],  # sorted vocabulary, for prefix lookups
+        "doc_terms": {},  # product_id -> set of terms, for incremental removal
+        "products": {}  # str(product_id) -> product
+    }
+
+def _index_product(index, product):
+    product_id = str(product['_id'])
+    weights = {}
+    for field, field_weight in SEARCH_FIELD_WEIGHTS.items():
+        for term in set(tokenize_search_text(product.get(field))):
+            weights[term] = weights.get(term, 0) + field_weight
+    
+    for term, weight in weights.items():
+        postings = index['postings'].get(term)
+        if postings is None:
+            postings = index['postings'][term] = {}
+            bisect.insort(index['terms'], term)
+            if len(term) >= SEARCH_MIN_TYPO_LENGTH:
+                for deletion in _single_deletions(term):
+                    index['deletes'].setdefault(deletion, set()).add(term)
+        postings[product_id] = weight
+    
+    index['doc_terms'][product_id] = set(weights)
+    index['products'][product_id] = product
+
+def _unindex_product(index, product_id):
+    for term in index['doc_terms'].pop(product_id, ()):
+        postings = index['postings'].get(term)
+        if postings is None:
+            continue
+        postings.pop(product_id, None)
+        if postings:
+            continue
+        del index['postings'][term]
+        position = bisect.bisect_left(index['terms'], term)
+        if position < len(index['terms']) and index['terms'][position] == term:
+            del index['terms'][position]
+        if len(term) >= SEARCH_MIN_TYPO_LENGTH:
+            for deletion in _single_deletions(term):
+                terms = index['deletes'].get(deletion)
+                if terms is not None:
+                    terms.discard(term)
+                    if not terms:
+                        del index['deletes'][deletion]
+    index['products'].pop(product_id, None)
+
+def get_search_index():
+    """Get the search index for the current catalog, rebuilding it if it is stale"""
+    global _search_index
+    catalog = get_cached_content('catalog', build_catalog_snapshot)
+    index = _search_index
+    if index is not None and index['version'] == catalog['version']:
+        return index
+    
+    with _search_index_lock:
+        if _search_index is not None and _search_index['version'] == catalog['version']:
+            return _search_index
+        index = _new_search_index(catalog['version'])
+        for product in catalog['payload']['products']:
+            _index_product(index, product)
+        _search_index = index
+        logger.info(f"🔎 Search index rebuilt: {len(index['products'])} products, {len(index['terms'])} terms")
+        return index
+
+def update_search_index(catalog_version, upserts=(), removed_ids=()):
+    """
+    Patch the search index after an admin change produced catalog_version.
+    If the index missed other changes in between, it is left to rebuild lazily.
+    """
+    with _search_index_lock:
+        index = _search_index
+        if index is None or index['version'] != (catalog_version - 1,):
+            return
+        for product_id in removed_ids:
+            _unindex_product(index, str(product_id))
+        for product in upserts:
+            _unindex_product(index, str(product['_id']))
+            _index_product(index, product)
+        index['version'] = (catalog_version,)
+
+def _expand_search_token(index, token):
+    """Yield (term, quality) pairs for exact, prefix and one-edit matches of token"""
+    postings = index['postings']
+    if token in postings:
+        yield token, 1.0
+    
+    terms = index['terms']
+    position = bisect.bisect_right(terms, token)
+    for term in terms[position:position + SEARCH_MAX_PREFIX_TERMS]:
+        if not term.startswith(token):
+            break
+        yield term, SEARCH_PREFIX_QUALITY
+    
+    if len(token) < SEARCH_MIN_TYPO_LENGTH:
+        return
+    candidates = set(index['deletes'].get(token, ()))  # Query is missing a character
+    for deletion in _single_deletions(token):
+        if deletion in postings:
+            candidates.add(deletion)  # Query has an extra character
+        candidates.update(index['deletes'].get(deletion, ()))  # Substitutions and swaps
+    for term in candidates:
+        if term != token and not term.startswith(token) and _within_one_edit(token, term):
+            yield term, SEARCH_TYPO_QUALITY
+
+def search_products(query, limit=DEFAULT_SEARCH_LIMIT, category=None):
+    """Rank products for a free-text query; products matching more query words rank first"""
+    index = get_search_index()
+    scores = {}
+    matched_tokens = {}
+    
+    for token in dict.fromkeys(tokenize_search_text(query)):
+        token_scores = {}
+        for term, quality in _expand_search_token(index, token):
+            for product_id, weight in index['postings'][term].items():
+                score = weight * quality
+                if score > token_scores.get(product_id, 0):
+                    token_scores[product_id] = score
+        for product_id, score in token_scores.items():
+            scores[product_id] = scores.get(product_id, 0) + score
+            matched_tokens[product_id] = matched_tokens.get(product_id, 0) + 1
+    
+    products = index['products']
+    if category:
+        scores = {pid: score for pid, score in scores.items() if products[pid].get('category') == category}
+    
+    ranked = sorted(scores, key=lambda pid: (-matched_tokens[pid], -scores[pid], str(products[pid].get('name', ''))))
+    return [products[pid] for pid in ranked[:limit]]
+
+# Search Products (Public)
+@app.route('/products/search', methods=['GET'])
+def search_products_route():
+    """Search products by name, category and description with prefix and typo tolerance"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"success": False, "message": "Search query is required."}), 400
         
-        # Sort by total spent
-        users.sort(key=lambda x: x.get('total_spent', 0), reverse=True)
+        try:
+            limit = parse_page_limit(request.args, default=DEFAULT_SEARCH_LIMIT, maximum=MAX_SEARCH_LIMIT)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
         
-        return jsonify({"success": True, "customers": users}), 200
+        products = search_products(query, limit=limit, category=request.args.get('category'))
+        return jsonify({"success": True, "query": query, "products": products, "count": len(products)}), 200
         
     except Exception as e:
-        logger.error(f"❌ Error fetching customer stats: {e}")
+        logger.error(f"❌ Error searching products: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Get All Products (Public)
 @app.route('/products', methods=['GET'])
 def get_products():
-    """Get all products (public endpoint)"""
+    """Get all products (public endpoint, served from the catalog snapshot unless paginated)"""
     try:
-        products = list(products_collection.find({}))
-        
-        for product in products:
-            product['_id'] = str(product['_id'])
+        if wants_product_page(request.args):
+            try:
+                return jsonify(list_products_page(request.args)), 200
+            except ValueError as e:
+                return jsonify({"success": False, "message": str(e)}), 400
         
-        return jsonify({"success": True, "products": products}), 200
+        catalog = get_cached_content('catalog', build_catalog_snapshot)
+        return cached_content_response(catalog)
         
     except Exception as e:
         logger.error(f"❌ Error fetching products: {e}")
@@ -2665,23 +5458,35 @@ def get_products():
 
 # ========== CATEGORY MANAGEMENT ==========
 
+# Build the category list served by GET /categories
+def build_categories_snapshot():
+    """Load all categories with their product counts"""
+    # Get all categories from categories_collection
+    categories = list(categories_collection.find({}, {'_id': 0}))
+    
+    # Count products per category in a single aggregation
+    counts = {
+        row['_id']: row['count']
+        for row in products_collection.aggregate([
+            {"$group": {"_id": "$category", "count": {"$sum": 1}}}
+        ])
+    }
+    for cat in categories:
+        cat['product_count'] = counts.get(cat['name'], 0)
+    
+    # Sort by name
+    categories.sort(key=lambda x: x['name'])
+    
+    return {"success": True, "categories": categories}
+
 # Get All Categories
 @app.route('/categories', methods=['GET'])
 def get_categories():
     """Get all categories from categories collection"""
     try:
-        # Get all categories from categories_collection
-        categories = list(categories_collection.find({}, {'_id': 0}))
-        
-        # Get product count for each category
-        for cat in categories:
-            count = products_collection.count_documents({'category': cat['name']})
-            cat['product_count'] = count
-        
-        # Sort by name
-        categories.sort(key=lambda x: x['name'])
-        
-        return jsonify({"success": True, "categories": categories}), 200
+        # Product counts change with the catalog, so depend on both versions
+        categories = get_cached_content('categories', build_categories_snapshot, depends_on=('categories', 'catalog'))
+        return cached_content_response(categories)
         
     except Exception as e:
         logger.error(f"❌ Error fetching categories: {e}")
@@ -2725,6 +5530,7 @@ def add_category():
             "created_at": datetime.datetime.utcnow()
         }
         categories_collection.insert_one(new_category)
+        bump_content_version('categories')
         
         logger.info(f"✅ Category '{category_name}' added to categories collection")
         return jsonify({
@@ -2762,12 +5568,15 @@ def update_category():
             {'name': old_category},
             {'$set': {'name': new_category, 'display_name': new_category, 'updated_at': datetime.datetime.utcnow()}}
         )
+        bump_content_version('categories')
         
         # Update all products with this category
         result = products_collection.update_many(
             {'category': old_category},
             {'$set': {'category': new_category}}
         )
+        if result.modified_count > 0:
+            bump_content_version('catalog')
         
         logger.info(f"✅ Category renamed: '{old_category}' → '{new_category}' ({result.modified_count} products updated)")
         return jsonify({
@@ -2796,12 +5605,15 @@ def delete_category():
         
         # Delete category from categories_collection
         categories_collection.delete_one({'name': category_name})
+        bump_content_version('categories')
         
         # Move products to 'Uncategorized'
         result = products_collection.update_many(
             {'category': category_name},
             {'$set': {'category': 'Uncategorized'}}
         )
+        if result.modified_count > 0:
+            bump_content_version('catalog')
         
         logger.info(f"✅ Category '{category_name}' deleted. {result.modified_count} products moved to 'Uncategorized'")
         return jsonify({
@@ -2816,18 +5628,20 @@ def delete_category():
 
 # ========== BANNER MANAGEMENT ==========
 
+# Build the active banner served by GET /banners/active
+def build_active_banner_snapshot():
+    """Load the currently active banner"""
+    banner = banners_collection.find_one({'is_active': True})
+    
+    return {"success": True, "banner": banner}
+
 # Get Active Banner
 @app.route('/banners/active', methods=['GET'])
 def get_active_banner():
     """Get currently active banner for display"""
     try:
-        banner = banners_collection.find_one({'is_active': True})
-        
-        if not banner:
-            return jsonify({"success": True, "banner": None}), 200
-        
-        banner['_id'] = str(banner['_id'])
-        return jsonify({"success": True, "banner": banner}), 200
+        banner = get_cached_content('banners', build_active_banner_snapshot)
+        return cached_content_response(banner)
         
     except Exception as e:
         logger.error(f"❌ Error fetching active banner: {e}")
@@ -2843,9 +5657,6 @@ def get_all_banners():
         
         banners = list(banners_collection.find().sort('created_at', -1))
         
-        for banner in banners:
-            banner['_id'] = str(banner['_id'])
-        
         return jsonify({"success": True, "banners": banners}), 200
         
     except Exception as e:
@@ -2921,6 +5732,7 @@ def add_banner():
             banners_collection.update_many({}, {'$set': {'is_active': False}})
         
         result = banners_collection.insert_one(new_banner)
+        bump_content_version('banners')
         
         logger.info(f"✅ Banner added: {new_banner['text'][:50]}")
         return jsonify({
@@ -3023,6 +5835,8 @@ def update_banner(banner_id):
             {'_id': ObjectId(banner_id)},
             {'$set': update_fields}
         )
+        # Other banners may have been deactivated even if this one was not found
+        bump_content_version('banners')
         
         if result.matched_count > 0:
             logger.info(f"✅ Banner updated: {banner_id}")
@@ -3056,6 +5870,7 @@ def toggle_banner_status(banner_id):
             {'_id': ObjectId(banner_id)},
             {'$set': {'is_active': new_status, 'updated_at': datetime.datetime.utcnow()}}
         )
+        bump_content_version('banners')
         
         logger.info(f"✅ Banner status toggled: {banner_id} -> {new_status}")
         return jsonify({"success": True, "message": "Banner status updated!", "is_active": new_status}), 200
@@ -3075,6 +5890,7 @@ def delete_banner(banner_id):
         result = banners_collection.delete_one({'_id': ObjectId(banner_id)})
         
         if result.deleted_count > 0:
+            bump_content_version('banners')
             logger.info(f"✅ Banner deleted: {banner_id}")
             return jsonify({"success": True, "message": "Banner deleted successfully!"}), 200
         else:
@@ -3172,12 +5988,6 @@ def get_all_messages():
         # Get all messages sorted by date (newest first)
         messages = list(messages_collection.find({}).sort("created_at", -1))
         
-        # Convert ObjectId to string and format dates
-        for message in messages:
-            message['_id'] = str(message['_id'])
-            if isinstance(message.get('created_at'), datetime.datetime):
-                message['created_at'] = message['created_at'].isoformat()
-        
         return jsonify({"success": True, "messages": messages}), 200
         
     except Exception as e:
@@ -3248,18 +6058,20 @@ def delete_message():
 
 # ========== WELCOME POPUP/POSTER MANAGEMENT ==========
 
+# Build the active popup served by GET /popups/active
+def build_active_popup_snapshot():
+    """Load the currently active welcome popup/poster"""
+    popup = popups_collection.find_one({'is_active': True})
+    
+    return {"success": True, "popup": popup}
+
 # Get Active Popup
 @app.route('/popups/active', methods=['GET'])
 def get_active_popup():
     """Get currently active welcome popup/poster for display"""
     try:
-        popup = popups_collection.find_one({'is_active': True})
-        
-        if not popup:
-            return jsonify({"success": True, "popup": None}), 200
-        
-        popup['_id'] = str(popup['_id'])
-        return jsonify({"success": True, "popup": popup}), 200
+        popup = get_cached_content('popups', build_active_popup_snapshot)
+        return cached_content_response(popup)
         
     except Exception as e:
         logger.error(f"❌ Error fetching active popup: {e}")
@@ -3273,9 +6085,6 @@ def get_all_popups():
     try:
         popups = list(popups_collection.find({}).sort('created_at', -1))
         
-        for popup in popups:
-            popup['_id'] = str(popup['_id'])
-        
         return jsonify({"success": True, "popups": popups}), 200
         
     except Exception as e:
@@ -3319,6 +6128,7 @@ def add_popup():
         }
         
         result = popups_collection.insert_one(new_popup)
+        bump_content_version('popups')
         
         logger.info(f"✅ Popup created: {new_popup['title']}")
         return jsonify({
@@ -3367,6 +6177,8 @@ def update_popup(popup_id):
             {'_id': ObjectId(popup_id)},
             {'$set': update_data}
         )
+        # Other popups may have been deactivated even if this one was unchanged
+        bump_content_version('popups')
         
         if result.modified_count > 0:
             logger.info(f"✅ Popup updated: {popup_id}")
@@ -3388,6 +6200,7 @@ def delete_popup(popup_id):
         result = popups_collection.delete_one({'_id': ObjectId(popup_id)})
         
         if result.deleted_count > 0:
+            bump_content_version('popups')
             logger.info(f"✅ Popup deleted: {popup_id}")
             return jsonify({"success": True, "message": "Popup deleted successfully!"}), 200
         else: